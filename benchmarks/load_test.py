@@ -0,0 +1,165 @@
+"""
+Load test of the Pyro period server. A PyroServer is run in-process by a
+daemon configured like ``start_server.py``; for every given number of
+clients, as many client processes send requests via their own Pyro proxy
+for a fixed duration. The number of served requests per client count is
+printed.
+
+Periods are held in memory by default. Otherwise, the period files are
+written to the config directory and removed afterwards.
+
+Run from the repository root::
+
+    python -m benchmarks.load_test --clients 1,2,4
+
+The server threads share one interpreter, hence the request rate is not
+expected to grow with the number of clients; on a single core, it was
+measured at 0.65-1.3 times the rate of one client.
+"""
+from __future__ import print_function
+
+import argparse
+import glob
+import multiprocessing
+import os
+import random
+import threading
+import time
+
+import Pyro4
+from financeager.period import CONFIG_DIR
+from financeager.server import PyroServer
+from financeager.start_server import configure_daemon
+from financeager.storages import WalStorage
+from tinydb.storages import MemoryStorage
+
+
+Pyro4.config.COMMTIMEOUT = 5.0
+
+STORAGES = {"memory": MemoryStorage, "wal": WalStorage}
+
+NAMES = ["groceries", "rent", "fuel", "salary", "books", "coffee", "cinema"]
+
+
+def parse_options():
+    parser = argparse.ArgumentParser(
+            description="Measure the throughput of the period server.")
+    parser.add_argument("--clients", default="1,2,4,8",
+            help="comma-separated numbers of concurrent clients")
+    parser.add_argument("--duration", type=float, default=2.0,
+            help="seconds to send requests per number of clients")
+    parser.add_argument("--periods", type=int, default=1,
+            help="number of periods the requests are spread over")
+    parser.add_argument("--entries", type=int, default=1000,
+            help="number of entries per period")
+    parser.add_argument("--write-ratio", type=float, default=0.0,
+            help="fraction of requests adding an entry")
+    parser.add_argument("--backend", choices=sorted(PyroServer.BACKENDS),
+            default="tinydb")
+    parser.add_argument("--storage", choices=sorted(STORAGES),
+            default="memory", help="storage of the tinydb periods")
+    parser.add_argument("--durable", action="store_true",
+            help="force every write to disk")
+    parser.add_argument("--threads", type=int,
+            default=Pyro4.config.THREADPOOL_SIZE,
+            help="maximum number of server threads")
+    parser.add_argument("--single-threaded", action="store_true",
+            help="serve one request at a time")
+    return parser.parse_args()
+
+
+def random_entry(rng):
+    return dict(name=rng.choice(NAMES), value=round(rng.uniform(-100, 100), 2),
+            category=rng.choice(NAMES), date="2000-{:02d}-{:02d}".format(
+                rng.randint(1, 12), rng.randint(1, 28)))
+
+
+def run_client(uri, periods, write_ratio, start, duration, seed, counts):
+    """Send requests from `start` on for `duration` seconds and put the
+    number of requests into the queue `counts`."""
+    rng = random.Random(seed)
+    requests = 0
+    with Pyro4.Proxy(uri) as proxy:
+        proxy._pyroBind()
+        time.sleep(max(start - time.time(), 0))
+        deadline = start + duration
+        while time.time() < deadline:
+            period = rng.choice(periods)
+            if rng.random() < write_ratio:
+                proxy.run("add", period=period, **random_entry(rng))
+            elif requests % 2:
+                proxy.run("summary", period=period)
+            else:
+                proxy.run("print", period=period, name=rng.choice(NAMES))
+            requests += 1
+    counts.put(requests)
+
+
+def measure(uri, clients, periods, write_ratio, duration):
+    """Run `clients` client processes for `duration` seconds. Processes
+    instead of threads are used so that the clients do not compete with the
+    server for the interpreter lock.
+
+    :return: number of served requests
+    """
+    context = multiprocessing.get_context("spawn")
+    counts = context.Queue()
+    # leave time for starting the processes
+    start = time.time() + 1.0 + 0.1 * clients
+    processes = [context.Process(target=run_client, args=(str(uri), periods,
+        write_ratio, start, duration, seed, counts))
+        for seed in range(clients)]
+    for process in processes:
+        process.start()
+    requests = sum(counts.get() for _ in processes)
+    for process in processes:
+        process.join()
+    return requests
+
+
+def main():
+    options = parse_options()
+    server_kwargs = dict(backend=options.backend, durable=options.durable)
+    if options.backend == "tinydb":
+        server_kwargs["storage"] = STORAGES[options.storage]
+    elif options.storage == "memory":
+        server_kwargs["path"] = ":memory:"
+
+    configure_daemon(options.threads, options.single_threaded)
+    daemon = Pyro4.Daemon()
+    server = PyroServer(**server_kwargs)
+    uri = daemon.register(server)
+    loop = threading.Thread(target=daemon.requestLoop,
+            kwargs=dict(loopCondition=lambda: server.running))
+    loop.start()
+
+    periods = ["load-test-{}".format(p) for p in range(options.periods)]
+    rng = random.Random(0)
+    try:
+        with Pyro4.Proxy(uri) as proxy:
+            for period in periods:
+                proxy.run("add-many", period=period, entries=[
+                    random_entry(rng) for _ in range(options.entries)])
+
+        print("{:>7} {:>9} {:>11} {:>8}".format(
+            "Clients", "Requests", "Requests/s", "Relative"))
+        baseline = None
+        for clients in [int(c) for c in options.clients.split(",")]:
+            requests = measure(uri, clients, periods, options.write_ratio,
+                    options.duration)
+            throughput = requests / options.duration
+            if baseline is None:
+                baseline = throughput
+            print("{:>7} {:>9} {:>11.1f} {:>7.2f}x".format(clients, requests,
+                throughput, throughput / max(baseline, 1e-9)))
+    finally:
+        with Pyro4.Proxy(uri) as proxy:
+            proxy.run("stop")
+        loop.join()
+        daemon.close()
+        for path in glob.glob(os.path.join(CONFIG_DIR, "load-test-*")):
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -14,3 +14,9 @@ __license__     = 'GPL'
 # maintanence information
 __maintainer__  = 'Philipp Metzner'
 __email__       = 'beth.aleph@yahoo.de'
+
+# category assigned to entries that are added without category
+DEFAULT_CATEGORY = "unspecified"
+
+# format of entry dates
+DATE_FORMAT = "%Y-%m-%d"
@@ -4,18 +4,30 @@ Module containing top layer of backend communication.
 """
 from __future__ import unicode_literals, print_function
 
+import importlib
 import os
+import sys
+import time
 
-import financeager.pyro
+from financeager import importer
 from financeager.period import prettify
 from financeager.server import CONFIG_DIR
 
+# record of months migrated from XML files of the former GUI
+MIGRATION_PROGRESS_FILE = os.path.join(CONFIG_DIR, "migration.progress")
+
+# modules of the financeager package providing launch_server(), proxy() and
+# CommunicationError
+COMMUNICATION_MODULES = ("pyro", "unixsocket")
+
 
 class Cli(object):
 
     def __init__(self, cl_kwargs):
         self._cl_kwargs = cl_kwargs
-        self._communication_module = getattr(financeager, "pyro")
+        self._communication_module = importlib.import_module(
+                "financeager.{}".format(
+                    self._cl_kwargs.pop("communication_module", None) or "pyro"))
 
         self._stacked_layout = self._cl_kwargs.pop("stacked_layout", False)
 
@@ -29,9 +41,14 @@ class Cli(object):
         if command != "stop":
             self._communication_module.launch_server()
 
-        proxy = self._communication_module.proxy()
         try:
-            response = proxy.run(command, **self._cl_kwargs)
+            proxy = self._communication_module.proxy()
+            if command == "import":
+                response = self._import(proxy)
+            elif command == "migrate":
+                response = self._migrate(proxy)
+            else:
+                response = proxy.run(command, **self._cl_kwargs)
             if response is not None:
                 error = response.get("error")
                 if error is not None:
@@ -41,6 +58,16 @@ class Cli(object):
                 if elements is not None:
                     print(prettify(elements, self._stacked_layout))
 
+                element_ids = response.get("ids")
+                if element_ids is not None and command == "rm-many":
+                    print("{} {} entries".format(
+                        "Would remove" if self._cl_kwargs.get("dry_run")
+                        else "Removed", len(element_ids)))
+
+                summary = response.get("summary")
+                if summary is not None:
+                    print(format_summary(summary))
+
                 periods = response.get("periods")
                 if periods is not None:
                     for p in periods:
@@ -49,8 +76,82 @@ class Cli(object):
             # 'stop' requested but period server not launched
             print(e)
 
+    def _import(self, proxy):
+        """Import the entries of the CSV file given on the command line and
+        print the number of entries added per period.
+
+        :return: dict containing an error message if the import failed
+        """
+        filename = self._cl_kwargs.pop("file")
+        period = self._cl_kwargs.pop("period", None)
+        chunk_size = self._cl_kwargs.pop("chunk_size", importer.CHUNK_SIZE)
+
+        try:
+            file = sys.stdin if filename == "-" else open(filename, newline="")
+        except (IOError) as e:
+            return {"error": str(e)}
+        try:
+            entries = importer.read_entries(file, **self._cl_kwargs)
+            counts = importer.import_entries(proxy, entries, period=period,
+                    chunk_size=chunk_size)
+        except (ValueError) as e:
+            return {"error": str(e)}
+        finally:
+            if file is not sys.stdin:
+                file.close()
+
+        for period_name, count in sorted(counts.items(), key=str):
+            print("Imported {} entries into period {}".format(count,
+                "(default)" if period_name is None else period_name))
+
+    def _migrate(self, proxy):
+        """Migrate the GUI XML file given on the command line and print the
+        throughput per month and in total. Progress is recorded in
+        ``MIGRATION_PROGRESS_FILE``.
+
+        :return: dict containing an error message if the migration failed
+        """
+        filename = self._cl_kwargs.pop("file")
+        restart = self._cl_kwargs.pop("restart", False)
+
+        def report(year, month, count, duration):
+            print("{}-{:02d}: {:>6} entries ({:.0f} entries/s)".format(year,
+                month, count, count / max(duration, 1e-6)))
+
+        start = time.time()
+        try:
+            count = importer.migrate_gui_xml(proxy, filename,
+                    MIGRATION_PROGRESS_FILE, restart=restart, report=report)
+        except (IOError, ValueError) as e:
+            return {"error": str(e)}
+        duration = time.time() - start
+        print("Migrated {} entries in {:.1f}s ({:.0f} entries/s)".format(
+            count, duration, count / max(duration, 1e-6)))
+
     def _print_list(self):
         for file in os.listdir(CONFIG_DIR):
             filename, extension = os.path.splitext(file)
-            if extension in [".xml", ".json"]:
+            if extension in [".xml", ".json", ".db"]:
                 print(filename)
+
+def format_summary(summary):
+    """Format the response of the 'summary' command: the sums per category,
+    separately for earnings and expenses, followed by the sums per month."""
+    lines = []
+    for sign in ["earnings", "expenses"]:
+        sums = summary[sign]
+        lines.append("{:^38}".format(sign.capitalize()))
+        for category in sorted(sums):
+            lines.append("{:18} {:>8.2f}".format(
+                category.title(), abs(sums[category])))
+        lines.append("{:18} {:>8.2f}".format("Total", abs(sum(sums.values()))))
+        lines.append("")
+
+    lines.append("{:8} {:>9} {:>9} {:>9}".format(
+        "Month", "Earnings", "Expenses", "Balance"))
+    for month in sorted(summary["months"]):
+        sums = summary["months"][month]
+        lines.append("{:8} {:>9.2f} {:>9.2f} {:>9.2f}".format(month,
+            sums["earnings"], abs(sums["expenses"]),
+            sums["earnings"] + sums["expenses"]))
+    return "\n".join(lines)
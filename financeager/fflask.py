@@ -40,6 +40,8 @@ class _Proxy(object):
             response = requests.delete(url, data=kwargs)
         elif command == "add":
             response = requests.post(url, data=kwargs)
+        elif command == "add-many":
+            response = requests.post(url, json=kwargs)
         elif command == "list":
             response = requests.get("http://127.0.0.1:5000/financeager/periods")
         else:
@@ -0,0 +1,162 @@
+"""
+Module for importing entries from CSV files, f.i. bank statement exports.
+
+Rows are read one at a time and sent to the server in chunks via the
+``add-many`` command, hence memory usage does not depend on the file size.
+XML files of the former GUI are migrated month by month.
+"""
+from __future__ import unicode_literals
+
+import csv
+import json
+import os
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from financeager import DATE_FORMAT
+from financeager.period import Period
+from financeager.xmlloader import iter_gui_months
+
+# number of entries sent to the server per request
+CHUNK_SIZE = 5000
+
+
+def read_entries(file, name_column="name", value_column="value",
+        date_column="date", category_column=None, delimiter=",",
+        date_format=DATE_FORMAT, decimal_comma=False):
+    """
+    Generate entries from the CSV `file`. The first row is expected to hold
+    the column names. Columns are mapped to the entry fields by the
+    `*_column` args; the category column is optional.
+
+    :param date_format: strptime format of the dates in the file
+    :param decimal_comma: values use ',' as decimal and '.' as thousands
+        separator (f.i. '-1.234,56')
+    :raises: ValueError if a column is missing or a row can not be parsed
+    :return: generator[dict] yielding keyword arguments of ``add_entry``
+    """
+    reader = csv.DictReader(file, delimiter=delimiter)
+    columns = [name_column, value_column, date_column]
+    if category_column is not None:
+        columns.append(category_column)
+    for column in columns:
+        if column not in (reader.fieldnames or []):
+            raise ValueError("Column not found: {}".format(column))
+
+    for row in reader:
+        name = row[name_column].strip()
+        if not name:
+            raise ValueError("Line {}: empty name".format(reader.line_num))
+
+        value = row[value_column].strip()
+        if decimal_comma:
+            value = value.replace(".", "").replace(",", ".")
+        try:
+            value = float(value)
+        except ValueError:
+            raise ValueError("Line {}: invalid value '{}'".format(
+                reader.line_num, row[value_column]))
+
+        date = row[date_column].strip() or None
+        if date is not None:
+            try:
+                date = datetime.strptime(date, date_format).strftime(
+                        DATE_FORMAT)
+            except ValueError:
+                raise ValueError("Line {}: invalid date '{}'".format(
+                    reader.line_num, row[date_column]))
+
+        category = None
+        if category_column is not None:
+            category = row[category_column].strip() or None
+
+        yield dict(name=name, value=value, date=date, category=category)
+
+
+def import_entries(proxy, entries, period=None, chunk_size=CHUNK_SIZE):
+    """
+    Add `entries` to the periods given by the year of their date, sending
+    chunks of at most `chunk_size` entries per period via `proxy`. Entries
+    without date are added to `period` (default period if None).
+
+    :param proxy: object with a ``run`` method, f.i. a
+        financeager.server.Server or a proxy of a communication module
+    :raises: ValueError if the server responds with an error. Entries of
+        chunks sent before remain imported.
+    :return: dict mapping period names to the number of imported entries
+    """
+    chunks = defaultdict(list)
+    counts = defaultdict(int)
+
+    def send(period_name):
+        chunk = chunks.pop(period_name)
+        response = proxy.run("add-many", period=period_name, entries=chunk)
+        error = (response or {}).get("error")
+        if error is not None:
+            raise ValueError(error)
+        counts[period_name] += len(chunk)
+
+    for entry in entries:
+        date = entry.get("date")
+        period_name = date[:4] if date is not None else "{}".format(
+                Period.DEFAULT_NAME if period is None else period)
+        chunks[period_name].append(entry)
+        if len(chunks[period_name]) >= chunk_size:
+            send(period_name)
+
+    for period_name in list(chunks):
+        send(period_name)
+
+    return dict(counts)
+
+
+def migrate_gui_xml(proxy, source, progress_file, restart=False,
+        report=None):
+    """
+    Add the entries of the XML file `source` written by the former GUI to
+    the period named by its year, sending one ``add-many`` request per
+    month via `proxy`. After each month, the number of completed months is
+    recorded in the JSON file `progress_file` (keyed by the absolute path of
+    `source`), and months recorded there are skipped when migrating again.
+
+    :param restart: ignore recorded progress
+    :param report: callable taking year, month number, number of entries
+        and duration of the request in seconds, called after each month
+    :raises: ValueError if the file can not be parsed or the server responds
+        with an error. Months migrated before remain recorded.
+    :return: number of added entries
+    """
+    key = os.path.abspath(source)
+    progress = {}
+    if os.path.isfile(progress_file):
+        with open(progress_file) as file:
+            progress = json.load(file)
+    completed = 0 if restart else progress.get(key, 0)
+
+    count = 0
+    for year, month, entries in iter_gui_months(source):
+        if month <= completed:
+            continue
+        start = time.time()
+        if entries:
+            response = proxy.run("add-many", period=str(year),
+                    entries=entries)
+            error = (response or {}).get("error")
+            if error is not None:
+                raise ValueError(error)
+        count += len(entries)
+
+        progress[key] = month
+        _write_progress(progress_file, progress)
+        if report is not None:
+            report(year, month, len(entries), time.time() - start)
+    return count
+
+
+def _write_progress(progress_file, progress):
+    # replace the file at once so that the record survives interruptions
+    tmp_file = progress_file + ".tmp"
+    with open(tmp_file, "w") as file:
+        json.dump(progress, file)
+    os.replace(tmp_file, progress_file)
@@ -0,0 +1,98 @@
+"""Defines an inverted trigram index for substring queries on period tables."""
+
+from __future__ import unicode_literals
+
+from collections import defaultdict
+
+# characters that give a query pattern a meaning other than the literal string
+_REGEX_SPECIAL_CHARACTERS = set(".^$*+?{}[]\\|()")
+
+
+def is_literal(query):
+    """Return whether the query string `query` (used as regex pattern when
+    matching elements) is a plain string without regex metacharacters."""
+    return not _REGEX_SPECIAL_CHARACTERS.intersection(query)
+
+
+class TrigramIndex(object):
+    """Maps each trigram of the indexed fields of an element to the set of IDs
+    of all elements containing it.
+
+    A substring query only matches elements that contain every trigram of the
+    query string, hence the intersection of the respective ID sets is a
+    superset of the matching elements. Callers are supposed to narrow a search
+    to these candidates and perform the exact check on them afterwards.
+    """
+
+    N = 3
+
+    def __init__(self, fields):
+        self._fields = fields
+        self._postings = {field: defaultdict(set) for field in fields}
+        self._eids = set()
+
+    def __len__(self):
+        return len(self._eids)
+
+    @classmethod
+    def _trigrams(cls, text):
+        return {text[i:i + cls.N] for i in range(len(text) - cls.N + 1)}
+
+    def add(self, eid, element):
+        """Index the fields of `element` under the ID `eid`."""
+        self._eids.add(eid)
+        for field in self._fields:
+            text = element.get(field)
+            if not isinstance(text, str):
+                continue
+            postings = self._postings[field]
+            for trigram in self._trigrams(text):
+                postings[trigram].add(eid)
+
+    def remove(self, eid, element):
+        """Remove the ID `eid` of the indexed `element` from the index."""
+        self._eids.discard(eid)
+        for field in self._fields:
+            text = element.get(field)
+            if not isinstance(text, str):
+                continue
+            postings = self._postings[field]
+            for trigram in self._trigrams(text):
+                eids = postings.get(trigram)
+                if eids is None:
+                    continue
+                eids.discard(eid)
+                if not eids:
+                    del postings[trigram]
+
+    def candidates(self, fields=None, **query_kwargs):
+        """Return the set of IDs of elements that possibly satisfy the
+        substring conditions given as `query_kwargs` (field name mapped to
+        query string). Only the given `fields` (default: all indexed fields)
+        are taken into account.
+
+        Queries that are shorter than a trigram or that contain regex
+        metacharacters can not be narrowed. If none of the queries is
+        narrowing, None is returned, indicating that all elements have to be
+        considered.
+        """
+        if fields is None:
+            fields = self._fields
+
+        result = None
+        for field in fields:
+            query = query_kwargs.get(field)
+            if not isinstance(query, str) or len(query) < self.N:
+                continue
+            if not is_literal(query):
+                continue
+
+            postings = self._postings[field]
+            for trigram in self._trigrams(query):
+                eids = postings.get(trigram)
+                if not eids:
+                    return set()
+                result = set(eids) if result is None else (result & eids)
+                if not result:
+                    return result
+        return result
@@ -18,6 +18,8 @@ from PyQt5.QtGui import QStandardItem
 from PyQt5.QtCore import QDate
 from abc import ABCMeta
 
+from financeager import DEFAULT_CATEGORY, DATE_FORMAT
+
 try:
     QString = unicode
 except NameError:
@@ -68,6 +70,12 @@ class NameItem(DataItem):
         #TODO handle empty name
         super(NameItem, self).__init__(data.lower(), entry)
 
+    @staticmethod
+    def normalize(text_):
+        """Return the data that is stored for the name `text_`, i.e. the
+        lowercase text with whitespace collapsed (cf. `setText`)."""
+        return QString(u' '.join(text_.lower().split()))
+
     def text(self):
         # workaround because QString has no capitalize method
         capitalized = u' '.join([t.capitalize() for t in self.data().split()])
@@ -82,7 +90,7 @@ class CategoryItem(NameItem):
 
     Cannot be edited. Text is printed in bold letters.
     """
-    DEFAULT_NAME = "unspecified"
+    DEFAULT_NAME = DEFAULT_CATEGORY
 
     def __init__(self, data, entry=None):
         super(CategoryItem, self).__init__(data, entry)
@@ -103,6 +111,8 @@ class ValueItem(DataItem):
     def __init__(self, data, entry=None):
         data = abs(float(data))
         super(ValueItem, self).__init__(data, entry)
+        # value accounted for in the sum of the parent category (see Model)
+        self._summed_value = 0.0
         # TODO add sign attribute
 
     def text(self):
@@ -135,7 +145,7 @@ class DateItem(DataItem):
     """
 
     QT_FORMAT = "yyyy-MM-dd"
-    FORMAT = "%Y-%m-%d"
+    FORMAT = DATE_FORMAT
 
     def __init__(self, data="", entry=None):
         date = QDate.fromString(data, DateItem.QT_FORMAT)
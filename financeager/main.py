@@ -1,9 +1,42 @@
 from __future__ import unicode_literals
 import argparse
-from financeager.cli import Cli
+import shlex
+import sys
+from financeager.cli import Cli, COMMUNICATION_MODULES
+from financeager import importer
+
+def _add_entry_arguments(parser):
+    parser.add_argument("name", help="entry name")
+    parser.add_argument("value", type=float, help="entry value")
+    parser.add_argument("-c", "--category", default=None,
+            help="entry category")
+    parser.add_argument("-d", "--date", default=None, help="entry date")
+
+    parser.add_argument("-r", "--repetitive", default=False,
+            nargs=argparse.REMAINDER, help="entry is repeated with given frequency,\
+                    from start date to end date (optional)")
+
+def parse_entries(lines):
+    """Parse entries given in the syntax of the 'add' subcommand, one per
+    line. Empty lines and comments (starting with '#') are skipped.
+
+    :return: list of dicts
+    """
+    parser = argparse.ArgumentParser(prog="financeager add-many")
+    _add_entry_arguments(parser)
+
+    entries = []
+    for line in lines:
+        args = shlex.split(line, comments=True)
+        if args:
+            entries.append(vars(parser.parse_args(args)))
+    return entries
 
 def parse_command():
     parser = argparse.ArgumentParser()
+    parser.add_argument("--communication-module", choices=COMMUNICATION_MODULES,
+            default="pyro", help="how to communicate with the period server \
+                    (default: %(default)s)")
 
     period_args = ("-p", "--period")
     period_kwargs = dict(default=None, help="name of period to modify or query")
@@ -13,18 +46,47 @@ def parse_command():
 
     add_parser = subparsers.add_parser("add",
             help="add an entry to the database")
+    _add_entry_arguments(add_parser)
+    add_parser.add_argument(*period_args, **period_kwargs)
 
-    add_parser.add_argument("name", help="entry name")
-    add_parser.add_argument("value", type=float, help="entry value")
-    add_parser.add_argument("-c", "--category", default=None,
-            help="entry category")
-    add_parser.add_argument("-d", "--date", default=None, help="entry date")
+    add_many_parser = subparsers.add_parser("add-many",
+            help="add multiple entries to the database at once")
+    add_many_parser.add_argument("file", nargs="?", default="-",
+            help="file containing one entry per line in the syntax of the \
+                    'add' subcommand (default: read from stdin)")
+    add_many_parser.add_argument(*period_args, **period_kwargs)
 
-    add_parser.add_argument("-r", "--repetitive", default=False,
-            nargs=argparse.REMAINDER, help="entry is repeated with given frequency,\
-                    from start date to end date (optional)")
+    import_parser = subparsers.add_parser("import",
+            help="import entries from a CSV file (f.i. bank statement)")
+    import_parser.add_argument("file",
+            help="CSV file with column names in the first row ('-' for stdin)")
+    import_parser.add_argument("--name-column", default="name",
+            help="column holding the entry names (default: %(default)s)")
+    import_parser.add_argument("--value-column", default="value",
+            help="column holding the entry values (default: %(default)s)")
+    import_parser.add_argument("--date-column", default="date",
+            help="column holding the entry dates (default: %(default)s)")
+    import_parser.add_argument("--category-column", default=None,
+            help="column holding the entry categories (optional)")
+    import_parser.add_argument("--delimiter", default=",",
+            help="column delimiter (default: '%(default)s')")
+    import_parser.add_argument("--date-format", default=importer.DATE_FORMAT,
+            help="date format as understood by strptime (default: %(default)s)")
+    import_parser.add_argument("--decimal-comma", action="store_true",
+            help="values use ',' as decimal separator")
+    import_parser.add_argument("--chunk-size", type=int,
+            default=importer.CHUNK_SIZE,
+            help="number of entries sent per request (default: %(default)s)")
+    import_parser.add_argument(*period_args, default=None,
+            help="period of entries without date; others are added to the \
+                    period of their year")
 
-    add_parser.add_argument(*period_args, **period_kwargs)
+    migrate_parser = subparsers.add_parser("migrate",
+            help="add the entries of an XML file of the former GUI to the \
+                    period of its year")
+    migrate_parser.add_argument("file", help="XML file written by the GUI")
+    migrate_parser.add_argument("--restart", action="store_true",
+            help="migrate all months, even if recorded as migrated before")
 
     stop_parser = subparsers.add_parser("stop",
             help="stop period server")
@@ -36,6 +98,20 @@ def parse_command():
     rm_parser.add_argument("name", help="entry name")
     rm_parser.add_argument(*period_args, **period_kwargs)
 
+    rm_many_parser = subparsers.add_parser("rm-many",
+            help="remove all entries matching the query from the database")
+    rm_many_parser.add_argument("name", nargs="?", default=None,
+            help="only entries containing 'name'")
+    rm_many_parser.add_argument("-c", "--category", default=None,
+            help="only entries containing 'category'")
+    rm_many_parser.add_argument("-d", "--date", default=None,
+            help="only entries containing 'date'")
+    rm_many_parser.add_argument("-l", "--limit", type=int, default=None,
+            help="remove nothing if more entries match")
+    rm_many_parser.add_argument("-n", "--dry-run", action="store_true",
+            help="only show the number of matching entries")
+    rm_many_parser.add_argument(*period_args, **period_kwargs)
+
     print_parser = subparsers.add_parser("print",
             help="show the period database")
     print_parser.add_argument("name", nargs="?", default=None,
@@ -48,6 +124,12 @@ def parse_command():
             help="if true, display earnings and expenses in stacked layout, otherwise side-by-side")
     print_parser.add_argument(*period_args, **period_kwargs)
 
+    summary_parser = subparsers.add_parser("summary",
+            help="show the sums per category and month")
+    summary_parser.add_argument("-m", "--month", default=None,
+            help="only entries of the given month (YYYY-MM)")
+    summary_parser.add_argument(*period_args, **period_kwargs)
+
     list_parser = subparsers.add_parser("list",
             help="list all databases")
     list_parser.add_argument("-r", "--running", action='store_true',
@@ -57,8 +139,16 @@ def parse_command():
 
 def main():
     args = parse_command()
+    cl_kwargs = vars(args)
+    if args.command == "add-many":
+        filename = cl_kwargs.pop("file")
+        if filename == "-":
+            cl_kwargs["entries"] = parse_entries(sys.stdin)
+        else:
+            with open(filename) as file:
+                cl_kwargs["entries"] = parse_entries(file)
     # print(vars(args))
-    cli = Cli(vars(args))
+    cli = Cli(cl_kwargs)
     cli()
 
 if __name__ == "__main__":
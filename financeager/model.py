@@ -4,8 +4,9 @@ from __future__ import unicode_literals
 from PyQt5.QtGui import QStandardItemModel
 from PyQt5.QtCore import (QVariant, Qt)
 import xml.etree.ElementTree as ET
+from collections import OrderedDict
 from financeager.entries import BaseEntry, CategoryEntry
-from financeager.items import ValueItem, CategoryItem
+from financeager.items import ValueItem, CategoryItem, NameItem, DateItem
 
 try:
     QString = unicode
@@ -19,12 +20,31 @@ class Model(QStandardItemModel):
     are provided to iterate over these.
     When a `root_element` (type `ET.Element`) is passed at initialization, the
     model is built from it.
+    CategoryItems are indexed by their name, so categories are looked up in
+    constant time. The index is updated when rows are added via `add_entry`
+    or `add_entries`, or removed (by any means).
+    Category sums and the total value are updated by differences whenever
+    entries are inserted, modified or removed. Each ValueItem keeps track of
+    the value it contributed to the sum of its category.
+    Many entries are added at once with `add_entries`, which inserts the rows
+    with signals blocked and updates each sum only once.
+    The NameItems of BaseEntries are indexed per category by their name and
+    date, so `find_name_item` and `remove_entry` do not scan the category
+    when both are given. The index follows insertions, removals and edits
+    of name or date.
     """
 
     def __init__(self, root_element=None, name=None):
         super(QStandardItemModel, self).__init__()
         self._name = name
+        self._category_items = {}
+        # {category name: {(name, date): [NameItem, ...]}}
+        self._name_items = {}
+        self._total_value = 0.0
         self.itemChanged.connect(self._update_sum_item)
+        self.itemChanged.connect(self._update_name_index)
+        self.rowsInserted.connect(self._insert_rows)
+        self.rowsAboutToBeRemoved.connect(self._remove_rows)
         self.setHorizontalHeaderLabels(
                 [k.capitalize() for k in BaseEntry.ITEM_TYPES])
         if root_element is not None:
@@ -33,9 +53,7 @@ class Model(QStandardItemModel):
     @classmethod
     def from_tinydb(cls, elements, name=None):
         model = cls(name=name)
-        for element in elements:
-            model.add_entry(BaseEntry(element["name"], element["value"],
-                element.get("date")), category=element.get("category"))
+        model.add_entries(elements)
         return model
 
     def __str__(self):
@@ -65,13 +83,69 @@ class Model(QStandardItemModel):
         if category is None:
             category = CategoryItem.DEFAULT_NAME
         if isinstance(entry, CategoryEntry):
-            if entry.name_item.data() not in self.category_entry_names:
+            name = entry.name_item.data()
+            if name not in self._category_items:
                 self.appendRow(entry.items)
+                self._category_items[name] = entry.name_item
         elif isinstance(entry, BaseEntry):
-            self.add_entry(CategoryEntry(category))
             category_item = self.find_category_item(category)
+            if category_item is None:
+                category_entry = CategoryEntry(category)
+                self.add_entry(category_entry)
+                category_item = self._category_items[
+                        category_entry.name_item.data()]
+            # the sum is updated when the row is inserted
             category_item.appendRow(entry.items)
-            self.itemChanged.emit(entry.value_item)
+
+    def add_entries(self, elements):
+        """Add BaseEntries built from the given elements (dicts holding
+        `name`, `value` and optionally `date` and `category`, f.i. TinyDB
+        elements). The elements are grouped by category, and the rows are
+        inserted with signals blocked. The sum of every affected category is
+        updated once. Attached views are notified by a model reset.
+        """
+        # group by the stored category name (cf. find_category_item) and
+        # keep the spelling of the first occurrence for new categories
+        groups = OrderedDict()
+        for element in elements:
+            category = element.get("category")
+            if category is None:
+                category = CategoryItem.DEFAULT_NAME
+            key = CategoryItem.normalize(category)
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = (category, [])
+            group[1].append(BaseEntry(
+                element["name"], element["value"], element.get("date")))
+
+        col = list(BaseEntry.ITEM_TYPES).index("value")
+        blocked = self.blockSignals(True)
+        try:
+            for category, entries in groups.values():
+                category_item = self.find_category_item(category)
+                if category_item is None:
+                    category_entry = CategoryEntry(category)
+                    category_item = category_entry.name_item
+                    self.appendRow(category_entry.items)
+                    self._category_items[category_item.data()] = category_item
+                old_sum = category_item.entry.sum_item.value
+                new_sum = old_sum
+                for entry in entries:
+                    items = entry.items
+                    category_item.appendRow(items)
+                    self._index_name_item(entry.name_item, category_item)
+                    value_item = items[col]
+                    new_sum += value_item.value
+                    value_item._summed_value = value_item.value
+                category_item.entry.sum_item.setText(
+                        QString("{}".format(new_sum)))
+                self._total_value += new_sum - old_sum
+        finally:
+            self.blockSignals(blocked)
+
+        if groups and not blocked:
+            self.beginResetModel()
+            self.endResetModel()
 
     def remove_entry(self, entry, category):
         """Querying the given category, remove the first base entry whose
@@ -80,13 +154,9 @@ class Model(QStandardItemModel):
         """
         item = self.find_name_item(name=entry.name_item.data(),
                 date=entry.date_item.text(), category=category)
-        category_item = item.parent()
+        # the sum is updated when the row is removed
+        #TODO remove category if empty ?
         self.removeRow(item.row(), item.index().parent())
-        if category_item.rowCount():
-            self.itemChanged.emit(category_item.child(0, 1))
-        else:
-            #TODO remove category bc empty ?
-            pass
 
     def category_entry_items(self, item_type):
         """Generator iterating over first-level children (CategoryEntries) of
@@ -127,12 +197,40 @@ class Model(QStandardItemModel):
 
     def find_category_item(self, category_name):
         """Find CategoryItem by given `category_name` or return None if not
-        found. The search is case insensitive.
+        found. The search is case insensitive and ignores repeated
+        whitespace.
         """
-        for category_item in self.category_entry_items("name"):
-            if category_item.data() == QString(category_name.lower()):
-                return category_item
-        return None
+        return self._category_items.get(CategoryItem.normalize(category_name))
+
+    def _remove_rows(self, parent, first, last):
+        """Slot that is called before rows are removed. For BaseEntries, their
+        values are subtracted from the category sum. For CategoryEntries, the
+        sum is subtracted from the total value, and the CategoryItem is
+        removed from the index."""
+        if parent.isValid():
+            category_item = self.itemFromIndex(parent)
+            col = list(BaseEntry.ITEM_TYPES).index("value")
+            for row in range(first, last + 1):
+                value_item = category_item.child(row, col)
+                delta = -value_item._summed_value
+                value_item._summed_value = 0.0
+                self._add_to_sum(category_item, delta)
+                self._unindex_name_item(category_item.child(row))
+            return
+
+        name_col = list(CategoryEntry.ITEM_TYPES).index("name")
+        sum_col = list(CategoryEntry.ITEM_TYPES).index("sum")
+        for row in range(first, last + 1):
+            self._total_value -= self.item(row, sum_col).value
+            category_name = self.item(row, name_col).data()
+            self._category_items.pop(category_name, None)
+            self._name_items.pop(category_name, None)
+
+    def clear(self):
+        super(Model, self).clear()
+        self._category_items.clear()
+        self._name_items.clear()
+        self._total_value = 0.0
 
     def category_sum(self, category_name):
         """Return sum of category named `category_name`."""
@@ -143,17 +241,76 @@ class Model(QStandardItemModel):
 
     def _update_sum_item(self, item):
         """Slot that updates the corresponding SumItem if a ValueItem is added
-        or modified."""
+        or modified. Only the difference to the value that the item
+        contributed so far is added."""
         if isinstance(item, ValueItem):
             category_item = item.parent()
             if category_item is None:
                 return
-            col = list(BaseEntry.ITEM_TYPES).index("value")
+            delta = item.value - item._summed_value
+            item._summed_value = item.value
+            if delta:
+                self._add_to_sum(category_item, delta)
+
+    def _insert_rows(self, parent, first, last):
+        """Slot that adds the values of BaseEntries inserted into a category
+        to its sum, and indexes their NameItems."""
+        if not parent.isValid():
+            return
+        category_item = self.itemFromIndex(parent)
+        col = list(BaseEntry.ITEM_TYPES).index("value")
+        for row in range(first, last + 1):
+            self._update_sum_item(category_item.child(row, col))
+            self._index_name_item(category_item.child(row), category_item)
+
+    def _index_name_item(self, name_item, category_item):
+        key = (name_item.data(), name_item.entry.date_item.text())
+        self._name_items.setdefault(category_item.data(), {}).setdefault(
+                key, []).append(name_item)
+        # remember the key in case name or date are modified later on
+        name_item._index_key = (category_item.data(), key)
+
+    def _unindex_name_item(self, name_item):
+        category_name, key = getattr(name_item, "_index_key", (None, None))
+        name_items = self._name_items.get(category_name, {})
+        if name_item in name_items.get(key, []):
+            name_items[key].remove(name_item)
+            if not name_items[key]:
+                del name_items[key]
+
+    def _update_name_index(self, item):
+        """Slot that re-indexes a BaseEntry if its name or date is
+        modified."""
+        if isinstance(item, CategoryItem) or \
+                not isinstance(item, (NameItem, DateItem)):
+            return
+        category_item = item.parent()
+        if category_item is None:
+            return
+        name_item = item.entry.name_item
+        self._unindex_name_item(name_item)
+        self._index_name_item(name_item, category_item)
+
+    def _add_to_sum(self, category_item, delta):
+        sum_item = category_item.entry.sum_item
+        sum_item.setText(QString("{}".format(sum_item.value + delta)))
+        self._total_value += delta
+
+    def recompute_sums(self):
+        """Recompute the category sums and the total value from scratch (they
+        are otherwise updated by differences) and return the total value."""
+        col = list(BaseEntry.ITEM_TYPES).index("value")
+        total_value = 0.0
+        for category_item in self.category_entry_items("name"):
             new_sum = 0.0
             for row in range(category_item.rowCount()):
-                new_sum += category_item.child(row, col).value
-            sum_item = category_item.entry.sum_item
-            sum_item.setText(QString("{}".format(new_sum)))
+                value_item = category_item.child(row, col)
+                new_sum += value_item.value
+                value_item._summed_value = value_item.value
+            category_item.entry.sum_item.setText(QString("{}".format(new_sum)))
+            total_value += new_sum
+        self._total_value = total_value
+        return total_value
 
     def find_name_item(self, **kwargs):
         """Find a NameItem by explicitely passing keyword arguments `name`
@@ -169,6 +326,18 @@ class Model(QStandardItemModel):
         category_item = self.find_category_item(category_name)
         if category_item is None:
             return None
+        if len(attributes) > 2:
+            # more than the name and the date can not match
+            return None
+        if len(attributes) == 2:
+            # attributes have to equal name and date, in either order
+            first, second = attributes
+            name_items = self._name_items.get(category_item.data(), {})
+            candidates = name_items.get((first, second), []) + \
+                    name_items.get((second, first), [])
+            if not candidates:
+                return None
+            return min(candidates, key=lambda item: item.row())
         for row in range(category_item.rowCount()):
             name_item = category_item.child(row)
             other_attributes = set()
@@ -202,13 +371,7 @@ class Model(QStandardItemModel):
 
     def create_from_xml(self, parent_element):
         self._name = parent_element.get("name")
-        for child in parent_element:
-            category_name = child.attrib.pop("category")
-            self.add_entry(BaseEntry(child.attrib['name'],
-                child.attrib['value'], child.attrib['date']), category_name)
+        self.add_entries(child.attrib for child in parent_element)
 
     def total_value(self):
-        result = 0.0
-        for item in self.category_entry_items("sum"):
-            result += item.data()
-        return result
+        return self._total_value
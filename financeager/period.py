@@ -1,28 +1,53 @@
 #-*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
-import os.path
+import bisect
+import calendar
+import itertools
+import os
+import re
+import sqlite3
+import threading
 from collections import defaultdict, Counter
 from dateutil import rrule
-from datetime import datetime as dt
+from datetime import datetime as dt, time
 
-from PyQt5.QtCore import QDate
 import xml.etree.ElementTree as ET
-from tinydb import TinyDB, Query, where, JSONStorage
+from tinydb import TinyDB, Query, JSONStorage
+from tinydb.storages import MemoryStorage
+from tinydb.middlewares import Middleware
 from tinydb.database import Element
 from tinydb.queries import QueryImpl
 
-from financeager.model import Model
-from financeager.entries import BaseEntry, CategoryEntry
-from financeager.items import DateItem, CategoryItem
+from financeager import recurrence, DEFAULT_CATEGORY, DATE_FORMAT
+from financeager.index import TrigramIndex, is_literal
+from financeager.rendering import prettify
+from financeager.storages import BufferedMiddleware, WalStorage
+from financeager.xmlloader import PeriodXmlReader, iter_chunks
 
 #FIXME create config singleton
 CONFIG_DIR = os.path.expanduser("~/.config/financeager")
 
+# frequencies whose occurrences are not restricted to midnight
+_SUBDAILY_FREQUENCIES = {"HOURLY", "MINUTELY", "SECONDLY"}
+# frequencies whose generated element names carry a month suffix
+_MONTHLY_FREQUENCIES = {"MONTHLY", "BIMONTHLY", "QUARTER-YEARLY", "HALF-YEARLY"}
+
+_DATE_PREFIX_REGEX = re.compile(r"^\d{4}(-\d{2}(-\d{2})?)?$")
+
+
+def _date_query_range(query):
+    """If the date query string `query` is of the form ``YYYY[-MM[-DD]]``, it
+    can only match a date in ``DATE_FORMAT`` as prefix. Return the range
+    ``[lower, upper)`` of the matching date strings then, otherwise None."""
+    if not isinstance(query, str) or not _DATE_PREFIX_REGEX.match(query):
+        return None
+    return query, query[:-1] + chr(ord(query[-1]) + 1)
+
 
 class Period(object):
 
-    DEFAULT_NAME = QDate.currentDate().year()
+    DEFAULT_NAME = dt.today().year
 
     def __init__(self, name=None):
         self._name = "{}".format(Period.DEFAULT_NAME if name is None else name)
@@ -32,8 +57,11 @@ class Period(object):
         return self._name
 
 class XmlPeriod(Period):
+    """Period holding entries in models (financeager.model.Model). Since the
+    models are Qt-based, Qt is imported on demand only."""
 
     def __init__(self, name=None, xml_element=None, models=None):
+        from financeager.model import Model
         super(XmlPeriod, self).__init__(name)
         # TODO store models in dict
         self._earnings_model = None
@@ -48,6 +76,7 @@ class XmlPeriod(Period):
             self._expenses_model = Model(name="expenses")
 
     def create_from_xml(self, xml_element):
+        from financeager.model import Model
         for model_element in xml_element.findall("model"):
             name = model_element.get("name")
             if name == "earnings":
@@ -56,6 +85,22 @@ class XmlPeriod(Period):
                 self._expenses_model = Model(model_element)
         self._name = xml_element.get("name", Period.DEFAULT_NAME)
 
+    @classmethod
+    def from_xml_file(cls, source):
+        """Create a period from the XML file `source` (file name or file
+        object) without building the element tree. The entries are added to
+        the models in chunks."""
+        from financeager.model import Model
+        models = (Model(name="earnings"), Model(name="expenses"))
+        reader = PeriodXmlReader(source)
+        for chunk in iter_chunks(reader):
+            # as in add_entry, the sign decides about the model
+            expenses = [str(e["value"]).startswith("-") for e in chunk]
+            models[0].add_entries(
+                    e for e, x in zip(chunk, expenses) if not x)
+            models[1].add_entries(e for e, x in zip(chunk, expenses) if x)
+        return cls(name=reader.name, models=models)
+
     def convert_to_xml(self):
         period_element = ET.Element("period", name=self._name)
         period_element.text = "\n"
@@ -66,6 +111,7 @@ class XmlPeriod(Period):
         return period_element
 
     def add_entry(self, **kwargs):
+        from financeager.entries import BaseEntry
         value = str(kwargs.pop("value"))
         category = kwargs.get("category")
         name = kwargs["name"]
@@ -77,38 +123,95 @@ class XmlPeriod(Period):
             self._earnings_model.add_entry(
                     BaseEntry(name, value, date), category=category)
 
-class TinyDbPeriod(TinyDB, Period):
+class DatabasePeriod(Period):
+    """
+    Base class for periods holding entries in a database with two tables:
+    ``standard`` contains single entries, ``repetitive`` contains templates of
+    entries that recur with a given frequency. The latter are 'expanded' into
+    single elements when queried.
 
-    def __init__(self, name=None, *args, **kwargs):
-        """
-        Create a period with a TinyDB database backend, identified by ``name``.
-        The filepath arg for tinydb.JSONStorage is derived from the name.
-        Keyword args other than ``default_table`` (set to ``standard``) are
-        passed to the TinyDB constructor (f.i. storage type).
-        """
+    Subclasses implement the storage specific methods
+    ``_create_category_cache``, ``_insert``, ``_remove``, ``_iter_table``
+    and ``_iter_all_tables``.
+    """
 
-        self._name = "{}".format(Period.DEFAULT_NAME if name is None else name)
-        kwargs["default_table"] = "standard"
-        if kwargs.get("storage", JSONStorage) == JSONStorage:
-            args = list(args) + [os.path.join(CONFIG_DIR, "{}.json".format(self._name))]
-        super(TinyDbPeriod, self).__init__(*args, **kwargs)
-        self._create_category_cache()
+    def flush(self):
+        """Persist buffered writes. No-op by default."""
+        pass
 
-    def _create_category_cache(self):
-        """The category cache assigns a counter for each element name in the
-        database (excluding repetitive elements), keeping track of the
-        categories the element was labeled with. This allows deriving the
-        category of an element if not explicitly given."""
-        self._category_cache = defaultdict(Counter)
-        for element in self.all():
-            self._category_cache[element["name"]].update([element["category"]])
+    @property
+    def pending_writes(self):
+        """Number of buffered writes that have not been persisted yet."""
+        return 0
+
+    @property
+    def persistent(self):
+        """Whether the period can be closed and reopened without losing
+        data. False by default."""
+        return False
+
+    @property
+    def resident_bytes(self):
+        """Estimate of the memory held by the open period. 0 by default."""
+        return 0
+
+    @property
+    def concurrent_reads(self):
+        """Whether querying methods (``print_entries``, ``summary``) may be
+        called from multiple threads at once. False by default."""
+        return False
 
     def add_entry(self, **kwargs):
+        table_name, element = self._create_element(**kwargs)
+        element_id = self._insert(table_name, element)
+        if table_name == "standard":
+            self._update_aggregates([element])
+        return {"id": element_id}
+
+    def add_entries(self, entries):
+        """Add multiple entries at once. Each entry is a dict of the keyword
+        arguments of ``add_entry``. Categories are inferred as if the entries
+        were added one after another, i.e. an entry may derive its category
+        from a preceding entry of the batch. The elements are inserted into
+        each table in a single write.
+
+        :return: dict with the IDs of the new elements in order of `entries`
+        """
+        tables = defaultdict(list)
+        positions = defaultdict(list)
+        for position, entry in enumerate(entries):
+            table_name, element = self._create_element(**entry)
+            tables[table_name].append(element)
+            positions[table_name].append(position)
+
+        element_ids = len(entries) * [None]
+        for table_name, elements in tables.items():
+            for position, element_id in zip(positions[table_name],
+                    self._insert_multiple(table_name, elements)):
+                element_ids[position] = element_id
+        self._update_aggregates(tables.get("standard", []))
+        return {"ids": element_ids}
+
+    def _insert_multiple(self, table_name, elements):
+        """Insert the `elements` into the table `table_name`. Subclasses may
+        override this to avoid one write per element.
+
+        :return: list of element IDs
+        """
+        return [self._insert(table_name, e) for e in elements]
+
+    def _create_element(self, **kwargs):
+        """Create the element described by the keyword arguments of
+        ``add_entry`` and update the caches accordingly.
+
+        :return: tuple of the name of the table to insert the element into,
+            and the element
+        """
         value = kwargs["value"]
         name = kwargs["name"].lower()
         date = kwargs.get("date")
         if date is None:
-            date = str(DateItem())
+            date = dt.today().strftime(DATE_FORMAT)
         category = kwargs.get("category")
 
         # derive category if not given but unique in cache
@@ -117,7 +220,7 @@ class TinyDbPeriod(TinyDB, Period):
                 category = self._category_cache[name].most_common(1)[0][0]
             else:
                 # assign default name (must be str), s.t. category field can be queried
-                category = CategoryItem.DEFAULT_NAME
+                category = DEFAULT_CATEGORY
         else:
             category = category.lower()
 
@@ -126,79 +229,131 @@ class TinyDbPeriod(TinyDB, Period):
         repetitive_args = kwargs.get("repetitive", False)
         if repetitive_args:
             frequency = repetitive_args[0].lower()
-            start = str(DateItem())
+            start = dt.today().strftime(DATE_FORMAT)
             if len(repetitive_args) > 1:
                 start = repetitive_args[1]
             end = None
             if len(repetitive_args) > 2:
                 end = repetitive_args[2]
-            element_id = self.table("repetitive").insert(
-                    dict(
-                        name=name, value=value, category=category,
-                        frequency=frequency, start=start, end=end
-                        ))
+            table_name = "repetitive"
+            element = dict(
+                    name=name, value=value, category=category,
+                    frequency=frequency, start=start, end=end
+                    )
+            self._repetitive_cache.pop(self._template_key(element), None)
+            self._repetitive_aggregates.pop(self._template_key(element), None)
         else:
-            element_id = self.insert(
-                    dict(
-                        name=name, value=value, date=date, category=category))
-        return {"id": element_id}
+            table_name = "standard"
+            element = dict(name=name, value=value, date=date, category=category)
+        return table_name, element
 
-    def _search_all_tables(self, query_impl=None, create_recurrent_elements=True):
-        """
-        Search both the standard table and the repetitive table for elements
-        that satisfy the given condition.
+    def _create_repetitive_cache(self):
+        """The repetitive cache memoizes the elements generated from each
+        template of the period's repetitive table (and their dates), keyed on
+        the template content. Along with the elements, the effective end date
+        of the expansion is stored; if it changed (f.i. because the current
+        date moved on), the elements are generated again."""
+        self._repetitive_cache = {}
 
-        :param query_impl: condition for the search. If none (default), all elements are returned.
-        :type query_impl: tinydb.queries.QueryImpl
+    @staticmethod
+    def _template_key(element):
+        return tuple(sorted(element.items()))
 
-        :param create_recurrent_elements: 'Expand' elements of the 'repetitive'
-            table prior to search (used when printing) or not (used when deleting).
-        :type create_recurrent_elements: bool
+    def _create_repetitive_elements(self, element, date_range=None):
+        """Generate the elements of the repetitive template `element` up to
+        its end date, or the current date (but not beyond the end of the
+        period) if none given. The result is served from the repetitive cache
+        if possible.
 
-        :return: list[tinydb.Element]
+        :param date_range: if given, only elements with a date within
+            ``[lower, upper)`` (date strings) are generated
         """
+        key = self._template_key(element)
+        end = self._repetitive_end(element)
+        cached = self._repetitive_cache.get(key)
+        if cached is None or cached[0] != end:
+            elements = tuple(self._expand_repetitive_element(element, end))
+            cached = (end, elements, tuple(e["date"] for e in elements))
+            self._repetitive_cache[key] = cached
+
+        _, elements, dates = cached
+        if date_range is not None:
+            # dates are sorted, and so are their string representations
+            elements = elements[bisect.bisect_left(dates, date_range[0]):
+                    bisect.bisect_left(dates, date_range[1])]
+
+        for e in elements:
+            yield Element(e)
+
+    def _create_matching_repetitive_elements(self, templates, query_impl=None,
+            query_kwargs=None):
+        """Generate the elements of the repetitive `templates` that satisfy
+        `query_impl`.
 
-        elements = []
+        Predicates that can be decided on the template itself are checked
+        before expansion, so that non-matching templates are never expanded:
+        category and value are passed on unchanged, and so is the name unless
+        a month suffix is appended. A date query of the form
+        ``YYYY[-MM[-DD]]`` bounds the range of generated elements. The
+        remaining predicates are checked on the generated elements.
+
+        :param query_kwargs: lowercased query strings the condition was
+            created from
+        :type query_kwargs: dict
+        """
         if query_impl is None:
-            elements.extend(self.all())
-        else:
-            elements.extend(self.search(query_impl))
+            for template in templates:
+                for e in self._create_repetitive_elements(template):
+                    yield e
+            return
 
-        if create_recurrent_elements:
-            for element in self.table("repetitive").all():
-                for e in self._create_repetitive_elements(element):
-                    if query_impl is None:
-                        elements.append(e)
-                    else:
-                        if query_impl(e):
-                            elements.append(e)
-        else:
-            if query_impl is None:
-                elements.extend(self.table("repetitive").all())
-            else:
-                elements.extend(self.table("repetitive").search(query_impl))
+        template_condition = self._create_query_condition(
+                **{k: v for k, v in query_kwargs.items()
+                    if k in ["category", "value"]})
+        name_condition = self._create_query_condition(
+                name=query_kwargs.get("name"))
+        date_range = _date_query_range(query_kwargs.get("date"))
 
-        return elements
+        for template in templates:
+            if template_condition is not None and \
+                    not template_condition(template):
+                continue
+            if name_condition is not None and \
+                    template["frequency"].upper() not in _MONTHLY_FREQUENCIES \
+                    and not name_condition(template):
+                continue
+            if date_range is not None:
+                if template["start"] >= date_range[1] or \
+                        self._repetitive_end(template).strftime(
+                            DATE_FORMAT) < date_range[0]:
+                    continue
+
+            for e in self._create_repetitive_elements(template,
+                    date_range=date_range):
+                if query_impl(e):
+                    yield e
+
+    def _repetitive_end(self, element):
+        end = element.get("end")
+        if end is not None:
+            return dt.strptime(end, DATE_FORMAT)
+
+        end = dt.now()
+        last_second = dt(int(self._name), 12, 31, 23, 59, 59)
+        if end > last_second:
+            end = last_second
+        if element["frequency"].upper() not in _SUBDAILY_FREQUENCIES:
+            # occurrences are at midnight, hence the cutoff is the end's date
+            end = dt.combine(end.date(), time())
+        return end
 
-    def _create_repetitive_elements(self, element):
+    def _expand_repetitive_element(self, element, end):
         name = element["name"]
         value = element["value"]
         category = element.get("category")
         frequency = element["frequency"].upper()
-        start = element["start"]
-        end = element.get("end")
-
-        if end is None:
-            end = dt.now()
-            last_second = dt(int(self._name), 12, 31, 23, 59, 59)
-            if end > last_second:
-                end = last_second
-        else:
-            end = dt.strptime(end, DateItem.FORMAT)
+        start = dt.strptime(element["start"], DATE_FORMAT)
 
-        rrule_kwargs = dict(
-                dtstart=dt.strptime(start, DateItem.FORMAT), until=end
-                )
         interval = 1
         if frequency == "BIMONTHLY":
             frequency = "MONTHLY"
@@ -210,41 +365,137 @@ class TinyDbPeriod(TinyDB, Period):
             frequency = "MONTHLY"
             interval = 6
 
-        rrule_kwargs["interval"] = interval
-        rule = rrule.rrule(getattr(rrule, frequency), **rrule_kwargs)
+        if frequency in recurrence.FREQUENCIES:
+            dates = recurrence.occurrences(frequency, start.date(), end.date(),
+                    interval=interval)
+            # the ISO format equals DATE_FORMAT
+            date_strings = [d.isoformat() for d in dates]
+        else:
+            dates = list(rrule.rrule(getattr(rrule, frequency), dtstart=start,
+                until=end, interval=interval))
+            date_strings = [d.strftime(DATE_FORMAT) for d in dates]
+
+        if frequency == "MONTHLY":
+            month_names = {m: calendar.month_name[m].lower()
+                    for m in {d.month for d in dates}}
+            names = ["{} {}".format(name, month_names[d.month]) for d in dates]
+        else:
+            names = len(dates) * [name]
+
+        for element_name, date in zip(names, date_strings):
+            yield dict(
+                name=element_name, value=value, category=category, date=date
+                )
 
-        for date in rule:
-            element_name = name
-            if frequency == "MONTHLY":
-                element_name = "{} {}".format(name, date.strftime("%B").lower())
-            yield Element(dict(
-                name=element_name, value=value, category=category,
-                date=date.strftime(DateItem.FORMAT)
-                ))
+    def iter_entries(self, create_recurrent_elements=True, limit=None,
+            **query_kwargs):
+        """Lazily search for elements matching the given query kwargs. The
+        elements are yielded as they are found; if `limit` is given, the
+        search stops after as many elements.
 
-    def find_entry(self, create_recurrent_elements=True, **query_kwargs):
+        :return: iterator[tinydb.Element]
+        """
         condition = self._create_query_condition(**query_kwargs)
-        return self._search_all_tables(condition,
-                create_recurrent_elements=create_recurrent_elements)
+        elements = self._iter_all_tables(condition,
+                create_recurrent_elements=create_recurrent_elements,
+                query_kwargs=self._normalize_query_kwargs(**query_kwargs))
+        if limit is not None:
+            elements = itertools.islice(elements, limit)
+        return elements
+
+    def find_entry(self, create_recurrent_elements=True, limit=None,
+            **query_kwargs):
+        return list(self.iter_entries(
+            create_recurrent_elements=create_recurrent_elements, limit=limit,
+            **query_kwargs))
+
+    def _search_all_tables(self, query_impl=None, create_recurrent_elements=True,
+            query_kwargs=None):
+        """List-returning wrapper around ``_iter_all_tables``.
+
+        :return: list[tinydb.Element]
+        """
+        return list(self._iter_all_tables(query_impl,
+            create_recurrent_elements=create_recurrent_elements,
+            query_kwargs=query_kwargs))
 
     def remove_entry(self, **kwargs):
-        entries = self.find_entry(create_recurrent_elements=False, **kwargs)
+        # two matches suffice to detect an ambiguous query
+        entries = self.find_entry(create_recurrent_elements=False, limit=2,
+                **kwargs)
         if entries:
             if len(entries) > 1:
                 return {"error": "Ambiguous query. Nothing is removed."}
             entry = entries[0]
             self._category_cache[entry["name"]][entry["category"]] -= 1
 
-            entry_id = entry.eid
-
-            if entry.get("frequency", False):
-                self.table("repetitive").remove(eids=[entry_id])
+            table_name = "repetitive" if entry.get("frequency", False) else "standard"
+            self._remove(table_name, entry)
+            if table_name == "repetitive":
+                self._repetitive_cache.pop(self._template_key(entry), None)
+                self._repetitive_aggregates.pop(self._template_key(entry), None)
             else:
-                self.remove(eids=[entry_id])
+                self._update_aggregates([entry], sign=-1)
 
-            return {"id": entry_id}
+            return {"id": entry.eid}
         return {"error": "No entry matching the query."}
 
+    def remove_entries(self, limit=None, dry_run=False, **query_kwargs):
+        """Remove all elements of both tables that satisfy the query given as
+        `query_kwargs` (see ``find_entry``; repetitive templates are matched
+        as stored). An empty query is refused.
+
+        :param limit: if the query matches more elements, nothing is removed
+        :param dry_run: only return the IDs of the elements that would be
+            removed
+        :return: dict with the IDs of the (to be) removed elements, or with
+            an error message
+        """
+        if not self._normalize_query_kwargs(**query_kwargs):
+            return {"error": "Empty query. Nothing is removed."}
+
+        entries = self.find_entry(create_recurrent_elements=False,
+                limit=None if limit is None else limit + 1, **query_kwargs)
+        if not entries:
+            return {"error": "No entry matching the query."}
+        if limit is not None and len(entries) > limit:
+            return {"error": "Query matches more than {} entries. "
+                    "Nothing is removed.".format(limit)}
+
+        element_ids = [e.eid for e in entries]
+        if dry_run:
+            return {"ids": element_ids}
+
+        tables = defaultdict(list)
+        for entry in entries:
+            table_name = "repetitive" if entry.get("frequency", False) else "standard"
+            tables[table_name].append(entry)
+
+        removed = Counter((e["name"], e["category"]) for e in entries)
+        for (name, category), count in removed.items():
+            self._category_cache[name][category] -= count
+
+        for table_name, elements in tables.items():
+            self._remove_multiple(table_name, elements)
+        self._update_aggregates(tables.get("standard", []), sign=-1)
+        for template in tables.get("repetitive", []):
+            self._repetitive_cache.pop(self._template_key(template), None)
+            self._repetitive_aggregates.pop(self._template_key(template), None)
+
+        return {"ids": element_ids}
+
+    def _remove_multiple(self, table_name, elements):
+        """Remove the `elements` from the table `table_name`. Subclasses may
+        override this to avoid one write per element."""
+        for element in elements:
+            self._remove(table_name, element)
+
+    @staticmethod
+    def _normalize_query_kwargs(**query_kwargs):
+        """Return the given query kwargs with lowercased string values, as
+        used when creating the query condition."""
+        return {k: v.lower() if isinstance(v, str) else v
+                for k, v in query_kwargs.items() if v is not None}
 
     def _create_query_condition(self, name=None, value=None, category=None, date=None):
         condition = None
@@ -268,50 +519,532 @@ class TinyDbPeriod(TinyDB, Period):
         return condition
 
     def print_entries(self, **query_kwargs):
-        condition = self._create_query_condition(**query_kwargs)
-        return {"elements": self._search_all_tables(condition)}
+        return {"elements": self.find_entry(**query_kwargs)}
+
+    def _create_aggregates(self):
+        """The aggregates hold the sum of values (in integer cents, to avoid
+        accumulating rounding errors) and the number of elements of the
+        standard table per sign ('earnings' or 'expenses'), category and
+        month. They are built on first use and updated on every modification
+        of the standard table.
+        The contributions of repetitive templates depend on the current date
+        and are kept per template, along with the end date of the expansion
+        they were computed for (cf. the repetitive cache)."""
+        self._aggregates = None
+        self._repetitive_aggregates = {}
+
+    @staticmethod
+    def _aggregate(elements, sign=1, aggregates=None):
+        """Add the values of the `elements` (multiplied by `sign`) to the
+        `aggregates` (new defaultdict if None) and return the latter."""
+        if aggregates is None:
+            aggregates = defaultdict(lambda: [0, 0])
+        for element in elements:
+            value = float(element["value"])
+            key = ("earnings" if value > 0 else "expenses",
+                    element["category"], element["date"][:7])
+            aggregate = aggregates[key]
+            aggregate[0] += sign * int(round(100 * value))
+            aggregate[1] += sign
+        return aggregates
+
+    def _update_aggregates(self, elements, sign=1):
+        if self._aggregates is not None:
+            self._aggregate(elements, sign=sign, aggregates=self._aggregates)
+
+    def _repetitive_aggregate(self, template):
+        """Return the aggregates of the elements generated from `template`."""
+        key = self._template_key(template)
+        end = self._repetitive_end(template)
+        cached = self._repetitive_aggregates.get(key)
+        if cached is None or cached[0] != end:
+            cached = (end, self._aggregate(
+                self._create_repetitive_elements(template)))
+            self._repetitive_aggregates[key] = cached
+        return cached[1]
+
+    def summary(self, month=None):
+        """Return the sums of values per sign and category, and per sign and
+        month, including elements generated from repetitive templates.
+
+        :param month: only take elements of this month (``YYYY-MM``) into
+            account
+        :return: dict
+        """
+        if self._aggregates is None:
+            self._aggregates = self._aggregate(self._iter_table("standard"))
+
+        all_aggregates = [self._aggregates]
+        all_aggregates.extend(self._repetitive_aggregate(t)
+                for t in self._iter_table("repetitive"))
 
-def prettify(elements, stacked_layout=False):
-    if not elements:
-        return ""
+        categories = {"earnings": defaultdict(int), "expenses": defaultdict(int)}
+        months = defaultdict(lambda: {"earnings": 0, "expenses": 0})
+        for aggregates in all_aggregates:
+            for (sign, category, month_), (cents, count) in aggregates.items():
+                if not count or (month is not None and month_ != month):
+                    continue
+                categories[sign][category] += cents
+                months[month_][sign] += cents
 
-    query = where("value") > 0
-    earnings = []
-    expenses = []
+        return {"summary": {
+            "earnings": {c: v / 100 for c, v in categories["earnings"].items()},
+            "expenses": {c: v / 100 for c, v in categories["expenses"].items()},
+            "months": {m: {sign: v / 100 for sign, v in values.items()}
+                for m, values in months.items()},
+            }}
 
-    for element in elements:
-        if query(element):
-            earnings.append(element)
+class TinyDbPeriod(TinyDB, DatabasePeriod):
+
+    INDEXED_FIELDS = ("name", "category", "date")
+
+    def __init__(self, name=None, *args, **kwargs):
+        """
+        Create a period with a TinyDB database backend, identified by ``name``.
+        The filepath arg for tinydb.JSONStorage (and subclasses, f.i.
+        financeager.storages.WalStorage, possibly wrapped in a middleware) is
+        derived from the name.
+        If ``write_behind`` or ``durable`` are set, the storage is wrapped in a
+        financeager.storages.BufferedMiddleware with the respective options.
+        Keyword args other than ``default_table`` (set to ``standard``) are
+        passed to the TinyDB constructor (f.i. storage type).
+        """
+
+        self._name = "{}".format(Period.DEFAULT_NAME if name is None else name)
+        kwargs["default_table"] = "standard"
+        write_behind = kwargs.pop("write_behind", False)
+        durable = kwargs.pop("durable", False)
+        if write_behind or durable:
+            kwargs["storage"] = BufferedMiddleware(
+                    kwargs.get("storage", JSONStorage),
+                    write_behind=write_behind, durable=durable)
+        storage = kwargs.get("storage", JSONStorage)
+        while isinstance(storage, Middleware):
+            storage = storage._storage_cls
+        self._filepath = None
+        if isinstance(storage, type) and issubclass(storage, JSONStorage):
+            self._filepath = os.path.join(CONFIG_DIR, "{}.json".format(self._name))
+            args = list(args) + [self._filepath]
+        super(TinyDbPeriod, self).__init__(*args, **kwargs)
+        # a missing table is created on first access, which must not happen
+        # while the period is read concurrently
+        self.table("repetitive")
+        self._create_category_cache()
+        self._create_repetitive_cache()
+        self._create_aggregates()
+        self._create_indices()
+
+    def _create_category_cache(self):
+        """The category cache assigns a counter for each element name in the
+        database (including repetitive templates, as they are counted when
+        added), keeping track of the categories the element was labeled with.
+        This allows deriving the category of an element if not explicitly
+        given."""
+        # the raw storage data is counted to avoid building an Element for
+        # every row
+        data = self._storage.read() or {}
+        counts = Counter((e["name"], e["category"]) for table_name in
+                ["standard", "repetitive"]
+                for e in data.get(table_name, {}).values())
+        self._category_cache = defaultdict(Counter)
+        for (name, category), count in counts.items():
+            self._category_cache[name][category] = count
+
+    def _data_stamp(self):
+        """Return size and modification time of the data file and of a
+        possibly existing write-ahead log (None for missing files)."""
+        stamp = []
+        if self._filepath is None:
+            return stamp
+        for path in [self._filepath, self._filepath + WalStorage.LOG_SUFFIX]:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                stamp.append(None)
+            else:
+                stamp.append([stat.st_size, stat.st_mtime_ns])
+        return stamp
+
+    def _create_indices(self):
+        """Prepare a trigram index for each table. The indices are used to
+        narrow substring queries to candidate elements before the actual
+        query is checked. They are built on first access (see ``_index``) so
+        that opening a period does not require scanning the database."""
+        self._indices = {}
+
+    def _index(self, table_name):
+        """Return the trigram index of the table `table_name`, building it if
+        not present yet."""
+        index = self._indices.get(table_name)
+        if index is None:
+            index = TrigramIndex(self.INDEXED_FIELDS)
+            for element in self.table(table_name).all():
+                index.add(element.eid, element)
+            self._indices[table_name] = index
+        return index
+
+    def flush(self):
+        """Persist buffered writes if the storage supports buffering (f.i.
+        financeager.storages.BufferedMiddleware)."""
+        flush = getattr(self._storage, "flush", None)
+        if flush is not None:
+            flush()
+
+    @property
+    def pending_writes(self):
+        """Number of buffered writes that have not been persisted yet."""
+        return getattr(self._storage, "pending_writes", 0)
+
+    @property
+    def persistent(self):
+        return self._filepath is not None
+
+    @property
+    def concurrent_reads(self):
+        """Storages serving reads from memory can be read concurrently,
+        whereas reading a JSONStorage seeks the shared file handle."""
+        storage = self._storage
+        return isinstance(storage, (BufferedMiddleware, WalStorage,
+            MemoryStorage))
+
+    @property
+    def resident_bytes(self):
+        """The database is cached in memory; its size is approximated by the
+        size of the data files."""
+        return sum(s[0] for s in self._data_stamp() if s is not None)
+
+    def _insert(self, table_name, element):
+        element_id = self.table(table_name).insert(element)
+        index = self._indices.get(table_name)
+        if index is not None:
+            index.add(element_id, element)
+        return element_id
+
+    def _insert_multiple(self, table_name, elements):
+        element_ids = self.table(table_name).insert_multiple(elements)
+        index = self._indices.get(table_name)
+        if index is not None:
+            for element_id, element in zip(element_ids, elements):
+                index.add(element_id, element)
+        return element_ids
+
+    def _remove(self, table_name, element):
+        self._remove_multiple(table_name, [element])
+
+    def _remove_multiple(self, table_name, elements):
+        self.table(table_name).remove(eids=[e.eid for e in elements])
+        index = self._indices.get(table_name)
+        if index is not None:
+            for element in elements:
+                index.remove(element.eid, element)
+
+    def _iter_all_tables(self, query_impl=None, create_recurrent_elements=True,
+            query_kwargs=None):
+        """
+        Search both the standard table and the repetitive table for elements
+        that satisfy the given condition. Elements are generated lazily.
+
+        :param query_impl: condition for the search. If none (default), all elements are returned.
+        :type query_impl: tinydb.queries.QueryImpl
+
+        :param create_recurrent_elements: 'Expand' elements of the 'repetitive'
+            table prior to search (used when printing) or not (used when deleting).
+        :type create_recurrent_elements: bool
+
+        :param query_kwargs: lowercased query strings the condition was
+            created from, used to narrow the search via the table indices
+        :type query_kwargs: dict
+
+        :return: generator[tinydb.Element]
+        """
+
+        if query_kwargs is None:
+            query_kwargs = {}
+
+        for element in self._iter_table("standard", query_impl,
+                self._index("standard").candidates(**query_kwargs)):
+            yield element
+
+        if create_recurrent_elements:
+            # generated names differ from template names; only the category
+            # is passed on to the generated elements
+            candidates = self._index("repetitive").candidates(
+                    fields=["category"], **query_kwargs)
+            elements = self._create_matching_repetitive_elements(
+                    self._iter_table("repetitive", None, candidates),
+                    query_impl, query_kwargs)
         else:
-            expenses.append(element)
+            elements = self._iter_table("repetitive", query_impl,
+                    self._index("repetitive").candidates(**query_kwargs))
+        for element in elements:
+            yield element
 
-    model_earnings = Model.from_tinydb(earnings, "Earnings")
-    model_expenses = Model.from_tinydb(expenses, "Expenses")
+    def _iter_table(self, table_name, query_impl=None, candidates=None):
+        """Generate the elements of the table `table_name` that satisfy
+        `query_impl`. If a set of `candidates` (element IDs) is given, only
+        these are looked up in the raw storage data and checked, instead of
+        building an Element for every row of the table. Otherwise the table
+        is searched, which makes use of the TinyDB query cache.
 
-    if stacked_layout:
-        return "{}\n\n{}\n\n{}".format(
-                str(model_earnings), 38*"-", str(model_expenses)
-                )
-    else:
-        result = []
-        models = [model_earnings, model_expenses]
-        models_str = [str(m).splitlines() for m in models]
-        for row in zip(*models_str):
-            result.append(" | ".join(row))
-        earnings_size = len(models_str[0])
-        expenses_size = len(models_str[1])
-        diff = earnings_size - expenses_size
-        if diff > 0:
-            for row in models_str[0][expenses_size:]:
-                result.append(row + " | ")
+        :return: generator[tinydb.Element]
+        """
+        if candidates is None:
+            table = self.table(table_name)
+            elements = table.all() if query_impl is None else \
+                    table.search(query_impl)
+            for element in elements:
+                yield element
+            return
+
+        data = (self._storage.read() or {}).get(table_name, {})
+        for eid in sorted(candidates):
+            # IDs are strings if the table has been read from a JSON file,
+            # and integers once TinyDB has written it back
+            value = data.get(eid)
+            if value is None:
+                value = data.get(str(eid))
+            if value is None:
+                continue
+            element = Element(value, eid)
+            if query_impl is None or query_impl(element):
+                yield element
+
+def _regexp(pattern, string):
+    """Implementation of the sqlite REGEXP operator."""
+    return string is not None and re.match(pattern, string) is not None
+
+class SqlitePeriod(DatabasePeriod):
+    """
+    Period with a sqlite3 database backend, identified by ``name``. The
+    database is stored as ``<name>.db`` in the config directory unless a
+    ``path`` is given (f.i. ``:memory:``).
+
+    Both tables carry indexes on the queried columns. Element values are
+    stored as floating point numbers, dates are expected in
+    ``DATE_FORMAT``. Every modification is committed immediately unless
+    ``write_behind`` is set; then the pending transaction is committed on
+    ``flush`` and ``close``. If ``durable`` is set, the database is fully
+    synchronized to disk on every commit.
+    """
+
+    FETCH_SIZE = 256
+
+    COLUMNS = {
+            "standard": ("name", "value", "category", "date"),
+            "repetitive": ("name", "value", "category", "frequency", "start",
+                "end")
+            }
+
+    def __init__(self, name=None, path=None, write_behind=False,
+            durable=False):
+        super(SqlitePeriod, self).__init__(name)
+        if path is None:
+            path = os.path.join(CONFIG_DIR, "{}.db".format(self._name))
+        self._path = path
+        # the connection may be used from server threads; access is locked
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.create_function("REGEXP", 2, _regexp)
+        self._lock = threading.RLock()
+        self._write_behind = write_behind and not durable
+        self._pending_writes = 0
+
+        self._connection.execute("PRAGMA journal_mode = WAL")
+        self._connection.execute("PRAGMA synchronous = {}".format(
+            "FULL" if durable else "NORMAL"))
+        self._create_tables()
+        self._create_category_cache()
+        self._create_repetitive_cache()
+        self._create_aggregates()
+
+    def _create_tables(self):
+        self._connection.executescript("""
+            CREATE TABLE IF NOT EXISTS standard (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                value REAL NOT NULL,
+                category TEXT NOT NULL,
+                date TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS standard_name ON standard (name);
+            CREATE INDEX IF NOT EXISTS standard_value ON standard (value);
+            CREATE INDEX IF NOT EXISTS standard_category ON standard (category);
+            CREATE INDEX IF NOT EXISTS standard_date ON standard (date);
+            CREATE TABLE IF NOT EXISTS repetitive (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                value REAL NOT NULL,
+                category TEXT NOT NULL,
+                frequency TEXT NOT NULL,
+                start TEXT NOT NULL,
+                "end" TEXT
+            );
+            CREATE INDEX IF NOT EXISTS repetitive_name ON repetitive (name);
+            CREATE INDEX IF NOT EXISTS repetitive_category ON repetitive (category);
+            """)
+
+    def _create_category_cache(self):
+        """Count the categories of each element name in both tables, see
+        TinyDbPeriod._create_category_cache."""
+        self._category_cache = defaultdict(Counter)
+        with self._lock:
+            rows = self._connection.execute(
+                    "SELECT name, category, COUNT(*) FROM ("
+                    "SELECT name, category FROM standard UNION ALL "
+                    "SELECT name, category FROM repetitive) "
+                    "GROUP BY name, category").fetchall()
+        for name, category, count in rows:
+            self._category_cache[name][category] = count
+
+    @property
+    def pending_writes(self):
+        return self._pending_writes
+
+    @property
+    def persistent(self):
+        return self._path != ":memory:"
+
+    @property
+    def concurrent_reads(self):
+        # access to the connection is serialized by the lock
+        return True
+
+    @property
+    def resident_bytes(self):
+        """sqlite caches pages of the database in memory; the size is
+        approximated by the size of the database."""
+        with self._lock:
+            if self._connection is None:
+                return 0
+            page_count, = self._connection.execute(
+                    "PRAGMA page_count").fetchone()
+            page_size, = self._connection.execute(
+                    "PRAGMA page_size").fetchone()
+        return page_count * page_size
+
+    def flush(self):
+        """Commit the pending transaction."""
+        with self._lock:
+            if self._pending_writes:
+                self._connection.commit()
+                self._pending_writes = 0
+
+    def close(self):
+        with self._lock:
+            if self._connection is None:
+                return
+            self._connection.commit()
+            self._pending_writes = 0
+            self._connection.close()
+            self._connection = None
+
+    def _insert(self, table_name, element):
+        return self._insert_multiple(table_name, [element])[0]
+
+    def _insert_multiple(self, table_name, elements):
+        """Insert the `elements` within a single transaction."""
+        columns = self.COLUMNS[table_name]
+        sql = "INSERT INTO {} ({}) VALUES ({})".format(
+                table_name,
+                ", ".join('"{}"'.format(c) for c in columns),
+                ", ".join(len(columns) * "?"))
+        with self._lock:
+            element_ids = [self._connection.execute(
+                sql, [e.get(c) for c in columns]).lastrowid for e in elements]
+            self._pending_writes += 1
+            if not self._write_behind:
+                self.flush()
+        return element_ids
+
+    def _remove(self, table_name, element):
+        self._remove_multiple(table_name, [element])
+
+    def _remove_multiple(self, table_name, elements):
+        """Remove the `elements` within a single transaction."""
+        with self._lock:
+            self._connection.executemany(
+                    "DELETE FROM {} WHERE id = ?".format(table_name),
+                    [(e.eid,) for e in elements])
+            self._pending_writes += 1
+            if not self._write_behind:
+                self.flush()
+
+    def _select(self, table_name, query_kwargs):
+        """Generate the elements of the table `table_name` satisfying the
+        (normalized) `query_kwargs`. Rows are fetched in batches of
+        ``FETCH_SIZE``.
+
+        Literal query strings are matched as substrings; queries containing
+        regex metacharacters are matched as in ``_create_query_condition``.
+        Date queries of the form ``YYYY[-MM[-DD]]`` are additionally
+        restricted to the corresponding range of the date index. Numeric
+        values are compared for equality.
+
+        :return: generator[tinydb.Element]
+        """
+        columns = self.COLUMNS[table_name]
+        clauses = []
+        parameters = []
+        for field, query in sorted(query_kwargs.items()):
+            if field not in columns:
+                # f.i. the repetitive table has no date field
+                return
+            column = '"{}"'.format(field)
+            if not isinstance(query, str):
+                clauses.append("{} = ?".format(column))
+                parameters.append(query)
+                continue
+            if is_literal(query):
+                clauses.append("instr({}, ?) > 0".format(column))
+                parameters.append(query)
+            else:
+                clauses.append("{} REGEXP ?".format(column))
+                parameters.append(".*{}.*".format(query))
+            date_range = _date_query_range(query) if field == "date" else None
+            if date_range is not None:
+                clauses.append("{0} >= ? AND {0} < ?".format(column))
+                parameters.extend(date_range)
+
+        sql = "SELECT id, {} FROM {}".format(
+                ", ".join('"{}"'.format(c) for c in columns), table_name)
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY id"
+
+        with self._lock:
+            cursor = self._connection.execute(sql, parameters)
+        while True:
+            with self._lock:
+                rows = cursor.fetchmany(self.FETCH_SIZE)
+            if not rows:
+                break
+            for row in rows:
+                yield Element(dict(zip(columns, row[1:])), eid=row[0])
+
+    def _iter_table(self, table_name):
+        """Generate all elements of the table `table_name`."""
+        return self._select(table_name, {})
+
+    def _iter_all_tables(self, query_impl=None, create_recurrent_elements=True,
+            query_kwargs=None):
+        """Lazily search both tables for elements satisfying the given
+        condition, see TinyDbPeriod._iter_all_tables.
+
+        :return: generator[tinydb.Element]
+        """
+        if query_kwargs is None:
+            query_kwargs = {}
+
+        for element in self._select("standard", query_kwargs):
+            yield element
+
+        if create_recurrent_elements:
+            # only the category is passed on to the generated elements
+            template_kwargs = {k: v for k, v in query_kwargs.items()
+                    if k == "category"}
+            elements = self._create_matching_repetitive_elements(
+                    self._select("repetitive", template_kwargs),
+                    query_impl, query_kwargs)
         else:
-            for row in models_str[1][earnings_size:]:
-                result.append(38*" " + " | " + row)
-        result.append(79*"=")
-        result.append(
-                " | ".join(
-                    [str(CategoryEntry(name="TOTAL", sum=m.total_value()))
-                        for m in models]
-                    )
-                )
-        return '\n'.join(result)
+            elements = self._select("repetitive", query_kwargs)
+        for element in elements:
+            yield element
@@ -1,42 +1,115 @@
 """
 Module for frontend-backend communication using the Pyro4 framework.
+
+Only one server (see ``start_server.py``) runs at a time: it holds an
+exclusive lock on ``LOCK_FILE`` for its lifetime. Once the server is ready to
+handle requests, it writes its URI and process ID to ``URI_FILE``. Clients
+connect to that URI directly, hence no Pyro name server is required.
 """
+from __future__ import unicode_literals
 
-import sys
-import subprocess
+import fcntl
+import json
 import os
+import subprocess
+import sys
 import time
 
 import Pyro4
+import Pyro4.errors
 
-from financeager.server import PyroServer
+from financeager.period import CONFIG_DIR
 
 
 Pyro4.config.COMMTIMEOUT = 1.0
 
+URI_FILE = os.path.join(CONFIG_DIR, "pyro-server.uri")
+LOCK_FILE = os.path.join(CONFIG_DIR, "pyro-server.lock")
+# serializes clients launching the server
+LAUNCH_LOCK_FILE = os.path.join(CONFIG_DIR, "pyro-launch.lock")
+
+# seconds to wait for a launched server to become ready
+LAUNCH_TIMEOUT = 10.0
+
+
+CommunicationError = Pyro4.errors.CommunicationError
+
+
+def write_uri_file(uri, path=URI_FILE):
+    """Signal readiness of the server process by atomically writing `uri`
+    and the process ID to `path`."""
+    tmp_path = "{}.{}.tmp".format(path, os.getpid())
+    with open(tmp_path, "w") as file:
+        json.dump(dict(uri=str(uri), pid=os.getpid()), file)
+    os.replace(tmp_path, path)
+
+
+def remove_uri_file(path=URI_FILE):
+    """Withdraw the readiness signal of the server process."""
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def server_uri(path=URI_FILE, lock_path=LOCK_FILE):
+    """
+    Return the URI of the running server, or None if the server is not
+    running. The server holds the lock on `lock_path` for its lifetime; if
+    the lock is free, the URI file was left by a server that did not exit
+    gracefully and is removed.
+    """
+    try:
+        with open(path) as file:
+            uri = json.load(file)["uri"]
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+    with open(lock_path, "a") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except (OSError):
+            return uri
+        # no server can write the URI file while the lock is held
+        remove_uri_file(path)
+    return None
+
 
 def launch_server():
     """
-    Launch Pyro4 nameserver. Silence errors if already running.
-    Launch PyroServer via starting script if server is not registered yet.
+    Launch PyroServer via starting script if it is not running yet, and wait
+    until it is ready. Concurrent calls launch at most one server.
+
+    :raises: CommunicationError if the server does not become ready in time
     """
-    with open(os.devnull, 'w') as DEVNULL:
-        subprocess.Popen("{} -m Pyro4.naming".format(sys.executable).split(),
-                stdout=DEVNULL, stderr=subprocess.STDOUT, close_fds=True)
+    if server_uri() is not None:
+        return
+
+    os.makedirs(CONFIG_DIR, exist_ok=True)
+    with open(LAUNCH_LOCK_FILE, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        # another client might have launched the server meanwhile
+        if server_uri() is not None:
+            return
 
-    name_server = Pyro4.locateNS()
-    try:
-        name_server.lookup(PyroServer.NAME)
-    except (Pyro4.naming.NamingError) as e:
         server_script_path = os.path.join(
                 os.path.dirname(os.path.abspath(__file__)), "start_server.py")
-        subprocess.Popen([sys.executable, server_script_path])
-        # wait for launch to avoid failure when creating Proxy
-        time.sleep(1.1*Pyro4.config.COMMTIMEOUT)
-
+        # the server must not hold on to the output or session of the calling
+        # process
+        process = subprocess.Popen([sys.executable, server_script_path],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                start_new_session=True)
 
-def proxy():
-    return Pyro4.Proxy("PYRONAME:{}".format(PyroServer.NAME))
+        deadline = time.time() + LAUNCH_TIMEOUT
+        while server_uri() is None:
+            if process.poll() not in (None, 0) or time.time() > deadline:
+                raise CommunicationError("Server did not start.")
+            time.sleep(0.01)
 
 
-CommunicationError = Pyro4.naming.NamingError
+def proxy():
+    """
+    :raises: CommunicationError if the server is not running
+    """
+    uri = server_uri()
+    if uri is None:
+        raise CommunicationError("Server not running.")
+    return Pyro4.Proxy(uri)
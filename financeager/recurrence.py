@@ -0,0 +1,62 @@
+"""Closed-form computation of the occurrences of repetitive entries.
+
+The results are identical to iterating a ``dateutil.rrule.rrule`` with the
+same frequency, interval, start and end (``until``), but all occurrences are
+computed at once by date arithmetic instead of evaluating the rule one
+occurrence at a time.
+"""
+
+from __future__ import unicode_literals
+
+import calendar
+from datetime import date
+
+FREQUENCIES = ("YEARLY", "MONTHLY", "WEEKLY", "DAILY")
+
+
+def occurrences(frequency, start, end, interval=1):
+    """Return the list of dates on which an entry starting at `start` recurs
+    with the given `frequency` (one of ``FREQUENCIES``) and `interval`, up to
+    and including `end`.
+
+    As with ``rrule``, monthly and yearly occurrences keep the day (and
+    month) of `start`; periods in which this day does not exist (f.i. the
+    31st in April, or February 29th in non-leap years) are skipped.
+
+    :type start: datetime.date
+    :type end: datetime.date
+    :raises: ValueError if `frequency` is not supported
+    :return: list[datetime.date]
+    """
+    if end < start:
+        return []
+
+    if frequency in ("DAILY", "WEEKLY"):
+        step = interval * (7 if frequency == "WEEKLY" else 1)
+        return [date.fromordinal(o) for o in
+                range(start.toordinal(), end.toordinal() + 1, step)]
+
+    if frequency == "MONTHLY":
+        first_month = 12 * start.year + start.month - 1
+        last_month = 12 * end.year + end.month - 1
+        months = range(first_month, last_month + 1, interval)
+        result = []
+        for year, month in (divmod(m, 12) for m in months):
+            if start.day <= calendar.monthrange(year, month + 1)[1]:
+                result.append(date(year, month + 1, start.day))
+        if result and result[-1] > end:
+            result.pop()
+        return result
+
+    if frequency == "YEARLY":
+        result = []
+        for year in range(start.year, end.year + 1, interval):
+            if start.month == 2 and start.day == 29 and \
+                    not calendar.isleap(year):
+                continue
+            result.append(date(year, start.month, start.day))
+        if result and result[-1] > end:
+            result.pop()
+        return result
+
+    raise ValueError("Unsupported frequency: {}".format(frequency))
@@ -0,0 +1,169 @@
+"""
+Qt-free rendering of period elements as text tables.
+
+The output is identical to the string representation of the
+financeager.model.Model built from the same elements, but no items are
+created: elements are reduced to plain records holding the formatted fields.
+"""
+from __future__ import unicode_literals
+
+import re
+from datetime import date as _date
+
+from financeager import DEFAULT_CATEGORY
+
+# dates in any other format are replaced by the current date (cf. DateItem)
+_DATE_REGEX = re.compile(r"([0-9]{4})-([0-9]{2})-([0-9]{2})")
+
+WIDTH = 38
+
+
+def _capitalize(data):
+    """Return the text of a NameItem holding `data`: whitespace-separated
+    words are capitalized and joined by single spaces."""
+    return " ".join(t.capitalize() for t in data.split())
+
+
+def _normalize_name(name):
+    """Return the data of a NameItem initialized with `name`."""
+    return _capitalize(name.lower()).lower()
+
+
+def _format_date(date):
+    """Return the text of a DateItem initialized with `date`."""
+    if isinstance(date, str):
+        match = _DATE_REGEX.fullmatch(date)
+        if match is not None:
+            try:
+                _date(*(int(g) for g in match.groups()))
+                return date
+            except ValueError:
+                pass
+    return _date.today().isoformat()
+
+
+class _Category(object):
+    __slots__ = ("name", "sum", "rows")
+
+    def __init__(self, name):
+        self.name = name
+        self.sum = 0.0
+        self.rows = []
+
+
+class Table(object):
+    """Holds the elements of a model as category records. Each record
+    contains the category name, the sum of the values and the rows of its
+    entries (name, value, date), in order of insertion.
+    """
+
+    def __init__(self, name=None):
+        self._name = name
+        self._categories = {}
+        # categories, names and dates recur, hence their formatting is
+        # memoized
+        self._category_records = {}
+        self._name_texts = {}
+        self._date_texts = {}
+
+    @classmethod
+    def from_elements(cls, elements, name=None):
+        """Counterpart of ``Model.from_tinydb``."""
+        table = cls(name=name)
+        for element in elements:
+            table.add_entry(element["name"], element["value"],
+                    element.get("date"), category=element.get("category"))
+        return table
+
+    def add_entry(self, name, value, date=None, category=None):
+        """Add an entry to the given category (default category if None).
+        As in the model, the value is stored as absolute value rounded to two
+        decimals, and category names are case-insensitive."""
+        record = self._category_records.get(category)
+        if record is None:
+            key = _normalize_name(
+                    DEFAULT_CATEGORY if category is None else category)
+            record = self._categories.get(key)
+            if record is None:
+                record = self._categories[key] = _Category(_capitalize(key))
+            self._category_records[category] = record
+
+        name_text = self._name_texts.get(name)
+        if name_text is None:
+            name_text = self._name_texts[name] = _capitalize(
+                    _normalize_name(name))
+        date_text = self._date_texts.get(date)
+        if date_text is None:
+            date_text = self._date_texts[date] = _format_date(date)
+
+        value = float("{:.2f}".format(abs(float(value))))
+        record.rows.append((name_text, value, date_text))
+        record.sum += value
+
+    def total_value(self):
+        result = 0.0
+        for record in self._categories.values():
+            result += record.sum
+        return result
+
+    def __str__(self):
+        result = ["{:^38}".format("Model" if self._name is None else self._name)]
+        result.append("{:18} {:8} {:10}".format("Name", "Value", "Date"))
+
+        for record in self._categories.values():
+            result.append(format_category_row(record.name, record.sum))
+            for name, value, date in record.rows:
+                result.append("  {:16.16} {:>8} {}".format(
+                    name, "{:.2f}".format(value), date))
+
+        return "\n".join(result)
+
+
+def format_category_row(name, value):
+    """Return the string representation of a CategoryEntry."""
+    value = float("{:.2f}".format(abs(float(value))))
+    return "{:18} {:>8} {:10}".format(name, "{:.2f}".format(value), "")
+
+
+def prettify(elements, stacked_layout=False):
+    """Return the elements formatted as tables of earnings (positive values)
+    and expenses, side by side (default) or one below the other."""
+    if not elements:
+        return ""
+
+    earnings = []
+    expenses = []
+    for element in elements:
+        if float(element["value"]) > 0:
+            earnings.append(element)
+        else:
+            expenses.append(element)
+
+    return prettify_tables(Table.from_elements(earnings, "Earnings"),
+            Table.from_elements(expenses, "Expenses"), stacked_layout)
+
+
+def prettify_tables(table_earnings, table_expenses, stacked_layout=False):
+    """Return the tables formatted as in ``prettify``."""
+    if stacked_layout:
+        return "{}\n\n{}\n\n{}".format(
+                str(table_earnings), WIDTH*"-", str(table_expenses)
+                )
+
+    result = []
+    tables = [table_earnings, table_expenses]
+    tables_str = [str(t).splitlines() for t in tables]
+    for row in zip(*tables_str):
+        result.append(" | ".join(row))
+    earnings_size = len(tables_str[0])
+    expenses_size = len(tables_str[1])
+    if earnings_size > expenses_size:
+        for row in tables_str[0][expenses_size:]:
+            result.append(row + " | ")
+    else:
+        for row in tables_str[1][earnings_size:]:
+            result.append(WIDTH*" " + " | " + row)
+    result.append(79*"=")
+    result.append(" | ".join(
+        [format_category_row("Total", t.total_value()) for t in tables]))
+    return "\n".join(result)
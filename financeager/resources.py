@@ -1,3 +1,4 @@
+from flask import request
 from flask_restful import Resource, reqparse
 
 from financeager.server import Server
@@ -28,6 +29,11 @@ class PeriodResource(Resource):
         return SERVER.run("print", period=period_name)
 
     def post(self, period_name):
+        data = request.get_json(silent=True)
+        if data is not None and "entries" in data:
+            # batch of entries, given as list of objects in JSON body
+            return SERVER.run("add-many", period=period_name,
+                    entries=data["entries"])
         args = put_parser.parse_args()
         return SERVER.run("add", period=period_name, **args)
 
@@ -1,23 +1,72 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
+import contextlib
 import os.path
+import threading
+from collections import OrderedDict
 import Pyro4
-from financeager.period import Period, TinyDbPeriod, CONFIG_DIR
+from financeager.period import Period, TinyDbPeriod, SqlitePeriod, CONFIG_DIR
 
 
 class Server(object):
     """
-    Server class holding the ``TinyDbPeriod`` databases.
+    Server class holding the period databases.
 
-    All database handling is taken care of in the underlying `TinyDbPeriod`.
-    Kwargs (f.i. storage) are passed to the TinyDbPeriod member.
+    All database handling is taken care of in the underlying `TinyDbPeriod`
+    or, if `backend` is ``sqlite``, `SqlitePeriod`.
+    Kwargs (f.i. storage) are passed to the period members.
+
+    If `write_behind` is set, modifying commands are acknowledged as soon as
+    the period is modified in memory. A background thread persists the
+    modified periods every `flush_interval` seconds, or earlier if a period
+    has accumulated `flush_size` unpersisted writes. Remaining writes are
+    persisted when the server is stopped. If `durable` is set, every write is
+    forced to disk (fsync) before the command returns instead.
+
+    Open periods are kept in least-recently-used order. If more than
+    `max_periods` periods are open, or if their `resident_bytes` sum up to
+    more than `max_bytes`, least-recently-used periods are closed (and
+    thereby flushed) after a command. They are reopened when requested
+    again. The period used last and periods that are not persistent (f.i.
+    using tinydb.storages.MemoryStorage) are never closed.
+
+    `run` may be called from multiple threads. Each period is guarded by a
+    reader/writer lock: querying commands (`READ_COMMANDS`) on the same
+    period run concurrently if the period supports concurrent reads, other
+    commands have exclusive access. Commands on different periods do not
+    block each other.
     """
 
-    def __init__(self, **kwargs):
+    FLUSH_INTERVAL = 1.0
+    FLUSH_SIZE = 100
+
+    BACKENDS = {"tinydb": TinyDbPeriod, "sqlite": SqlitePeriod}
+
+    READ_COMMANDS = {"print", "summary"}
+
+    def __init__(self, backend="tinydb", write_behind=False, durable=False,
+            flush_interval=FLUSH_INTERVAL, flush_size=FLUSH_SIZE,
+            max_periods=None, max_bytes=None, **kwargs):
         if not os.path.isdir(CONFIG_DIR):
             os.makedirs(CONFIG_DIR)
-        self._periods = {}
+        # least-recently-used period first
+        self._periods = OrderedDict()
+        # reader/writer lock per open period
+        self._period_locks = {}
+        # guards opening and closing of periods
+        self._periods_lock = threading.RLock()
+        self._period_class = self.BACKENDS[backend]
         self._period_kwargs = kwargs
+        self._max_periods = max_periods
+        self._max_bytes = max_bytes
+
+        self._write_behind = write_behind and not durable
+        self._durable = durable
+        self._flush_size = flush_size
+        self._flusher = None
+        if self._write_behind:
+            self._flusher = _Flusher(self, flush_interval)
+            self._flusher.start()
 
     def run(self, command, **kwargs):
         """
@@ -31,27 +80,193 @@ class Server(object):
         if command == "list":
             return self.periods()
         elif command == "stop":
+            if self._flusher is not None:
+                self._flusher.stop()
+                self._flusher = None
             # graceful shutdown, invoke closing of files
-            for period in self._periods.values():
-                period.close()
+            with self._periods_lock:
+                for name, period in self._periods.items():
+                    with self._period_locks[name].writing():
+                        period.close()
         else:
             period_name = kwargs.pop("period", None)
-            if period_name not in self._periods:
-                # default period stored with key 'None'
-                self._periods[period_name] = TinyDbPeriod(period_name,
-                        **self._period_kwargs)
+            period, lock, shared = self._acquire_period(period_name,
+                    command in self.READ_COMMANDS)
 
             command2method = {
                     "add": "add_entry",
+                    "add-many": "add_entries",
                     "rm": "remove_entry",
-                    "print": "print_entries"
+                    "rm-many": "remove_entries",
+                    "print": "print_entries",
+                    "summary": "summary"
                     }
-            response = getattr(
-                    self._periods[period_name], command2method[command])(**kwargs)
+            try:
+                response = getattr(period, command2method[command])(**kwargs)
+            finally:
+                lock.release(shared)
+
+            if self._flusher is not None and \
+                    period.pending_writes >= self._flush_size:
+                self._flusher.wake()
+            self._evict()
             return response
 
+    def _acquire_period(self, name, read):
+        """Open the period `name` if necessary and acquire its lock, shared if
+        `read` is set and the period supports concurrent reads.
+
+        :return: tuple of period, lock and whether the lock is shared
+        """
+        # the key has to match the period name, otherwise several period
+        # objects can be opened on the same file
+        name = "{}".format(Period.DEFAULT_NAME if name is None else name)
+        while True:
+            with self._periods_lock:
+                if name not in self._periods:
+                    self._periods[name] = self._create_period(name)
+                    self._period_locks[name] = _ReadWriteLock()
+                self._periods.move_to_end(name)
+                period = self._periods[name]
+                lock = self._period_locks[name]
+
+            shared = read and period.concurrent_reads
+            lock.acquire(shared)
+            if self._periods.get(name) is period:
+                return period, lock, shared
+            # closed in the meantime
+            lock.release(shared)
+
+    def _create_period(self, name):
+        return self._period_class(name, write_behind=self._write_behind,
+                durable=self._durable, **self._period_kwargs)
+
+    def _evict(self):
+        """Close least-recently-used periods while the limits of open periods
+        are exceeded."""
+        if self._max_periods is None and self._max_bytes is None:
+            return
+        with self._periods_lock:
+            # the period used last is not evicted
+            for name in list(self._periods)[:-1]:
+                if not self._exceeds_limits():
+                    break
+                lock = self._period_locks[name]
+                # periods in use are skipped
+                if not self._periods[name].persistent or \
+                        not lock.acquire(shared=False, blocking=False):
+                    continue
+                try:
+                    self._periods.pop(name).close()
+                    del self._period_locks[name]
+                finally:
+                    lock.release(shared=False)
+
+    def _exceeds_limits(self):
+        if self._max_periods is not None and \
+                len(self._periods) > self._max_periods:
+            return True
+        return self._max_bytes is not None and sum(p.resident_bytes for p in
+                self._periods.values()) > self._max_bytes
+
+    def flush(self):
+        """Persist buffered writes of all periods."""
+        with self._periods_lock:
+            periods = list(self._periods.values())
+        # flushing a period that has been closed meanwhile is a no-op
+        for period in periods:
+            period.flush()
+
     def periods(self):
-        return {"periods": [p._name for p in self._periods.values()]}
+        with self._periods_lock:
+            return {"periods": [p._name for p in self._periods.values()]}
+
+class _ReadWriteLock(object):
+    """Lock that is held either shared by any number of readers or
+    exclusively by a single writer. Waiting writers take precedence over
+    new readers."""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    def acquire(self, shared, blocking=True):
+        """Acquire the lock shared or exclusively.
+
+        :return: False if not `blocking` and the lock could not be acquired
+        """
+        with self._condition:
+            if shared:
+                while self._writer or self._waiting_writers:
+                    if not blocking:
+                        return False
+                    self._condition.wait()
+                self._readers += 1
+                return True
+
+            self._waiting_writers += 1
+            try:
+                while self._writer or self._readers:
+                    if not blocking:
+                        return False
+                    self._condition.wait()
+            finally:
+                self._waiting_writers -= 1
+            self._writer = True
+            return True
+
+    def release(self, shared):
+        with self._condition:
+            if shared:
+                self._readers -= 1
+            else:
+                self._writer = False
+            self._condition.notify_all()
+
+    @contextlib.contextmanager
+    def reading(self):
+        self.acquire(shared=True)
+        try:
+            yield
+        finally:
+            self.release(shared=True)
+
+    @contextlib.contextmanager
+    def writing(self):
+        self.acquire(shared=False)
+        try:
+            yield
+        finally:
+            self.release(shared=False)
+
+class _Flusher(threading.Thread):
+    """Background thread periodically flushing the periods of a server."""
+
+    def __init__(self, server, interval):
+        super(_Flusher, self).__init__(name="financeager-flusher")
+        self.daemon = True
+        self._server = server
+        self._interval = interval
+        self._wakeup = threading.Event()
+        self._stopped = False
+
+    def run(self):
+        while not self._stopped:
+            self._wakeup.wait(self._interval)
+            self._wakeup.clear()
+            if not self._stopped:
+                self._server.flush()
+
+    def wake(self):
+        """Trigger a flush without waiting for the interval to pass."""
+        self._wakeup.set()
+
+    def stop(self):
+        self._stopped = True
+        self._wakeup.set()
+        self.join()
 
 @Pyro4.expose
 class PyroServer(Server):
@@ -60,14 +275,17 @@ class PyroServer(Server):
 
     The server is typically launched at the initial `financeager`
     command line call and then runs in the background as a Pyro daemon.
-    Calling `stop` causes the Pyro daemon request loop to terminate.
+    Calling `stop` causes the Pyro daemon request loop to terminate. The
+    optional `on_stop` callable is invoked when `stop` is requested, before
+    the response is sent.
     """
 
     NAME = "financeager_tinydb_server"
 
-    def __init__(self, **kwargs):
+    def __init__(self, on_stop=None, **kwargs):
         super().__init__(**kwargs)
         self._running = True
+        self._on_stop = on_stop
 
     @property
     def running(self):
@@ -76,5 +294,7 @@ class PyroServer(Server):
     def run(self, command, **kwargs):
         if command == "stop":
             self._running = False
+            if self._on_stop is not None:
+                self._on_stop()
 
         return super().run(command, **kwargs)
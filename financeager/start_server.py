@@ -1,18 +1,111 @@
+import argparse
+import fcntl
+import os
+import sys
+import time
 import Pyro4
+from financeager.pyro import LOCK_FILE, URI_FILE, server_uri, write_uri_file, \
+        remove_uri_file
 from financeager.server import PyroServer
+from financeager.storages import WalStorage
 
 Pyro4.config.COMMTIMEOUT = 1.0
+# the request loop checks for a stop request at least this often (seconds);
+# a server launched meanwhile waits until the stopping one has exited
+Pyro4.config.POLLTIMEOUT = 0.1
+
+STORAGES = {"wal": WalStorage}
+
+
+def parse_options():
+    parser = argparse.ArgumentParser(
+            description="Run the financeager period server as Pyro daemon.")
+    parser.add_argument("--backend", choices=sorted(PyroServer.BACKENDS),
+            default="tinydb", help="database backend of the periods")
+    parser.add_argument("--storage", choices=["json"] + list(STORAGES),
+            default="json", help="storage of the tinydb period databases")
+    parser.add_argument("--write-behind", action="store_true",
+            help="acknowledge writes from memory and persist them periodically")
+    parser.add_argument("--flush-interval", type=float,
+            default=PyroServer.FLUSH_INTERVAL,
+            help="seconds between persisting buffered writes")
+    parser.add_argument("--durable", action="store_true",
+            help="force every write to disk before acknowledging it")
+    parser.add_argument("--max-periods", type=int, default=None,
+            help="maximum number of open periods")
+    parser.add_argument("--max-bytes", type=int, default=None,
+            help="maximum size of the data of open periods")
+    parser.add_argument("--threads", type=int,
+            default=Pyro4.config.THREADPOOL_SIZE,
+            help="maximum number of threads serving requests concurrently")
+    parser.add_argument("--single-threaded", action="store_true",
+            help="serve one request at a time")
+    parser.add_argument("--name-server", action="store_true",
+            help="additionally register the server at a Pyro name server")
+    return parser.parse_args()
+
+def configure_daemon(threads, single_threaded=False):
+    """Set the Pyro server type; has to be called before creating the
+    daemon."""
+    if single_threaded:
+        Pyro4.config.SERVERTYPE = "multiplex"
+    else:
+        Pyro4.config.SERVERTYPE = "thread"
+        Pyro4.config.THREADPOOL_SIZE = threads
+        Pyro4.config.THREADPOOL_SIZE_MIN = min(
+                Pyro4.config.THREADPOOL_SIZE_MIN, threads)
+
+def acquire_lock(path=LOCK_FILE, uri_path=URI_FILE):
+    """Exclusively lock `path` for the lifetime of the process. A server
+    that is shutting down still holds the lock; wait until it has exited.
+    A URI file at `uri_path` left by a previous server is removed.
+
+    :return: the locked file, or None if another server is ready
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    lock_file = open(path, "a")
+    while True:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except (OSError):
+            if server_uri(uri_path, path) is not None:
+                lock_file.close()
+                return None
+            time.sleep(0.01)
+        else:
+            remove_uri_file(uri_path)
+            return lock_file
 
 if __name__ == "__main__":
+    options = parse_options()
+    lock_file = acquire_lock()
+    if lock_file is None:
+        # another server is running
+        sys.exit(0)
+
+    server_kwargs = dict(backend=options.backend,
+            write_behind=options.write_behind,
+            flush_interval=options.flush_interval, durable=options.durable,
+            max_periods=options.max_periods, max_bytes=options.max_bytes)
+    if options.backend == "tinydb" and options.storage in STORAGES:
+        server_kwargs["storage"] = STORAGES[options.storage]
+
+    configure_daemon(options.threads, options.single_threaded)
     with Pyro4.Daemon() as daemon:
-        server = PyroServer()
-        ns = Pyro4.locateNS()
-        uri = daemon.register(server)
-        ns.register(PyroServer.NAME, uri)
+        # clients must not connect anymore once stop is requested
+        server = PyroServer(on_stop=remove_uri_file,
+                **server_kwargs)
+        uri = daemon.register(server, PyroServer.NAME)
+        if options.name_server:
+            ns = Pyro4.locateNS()
+            ns.register(PyroServer.NAME, uri)
 
+        # the daemon socket is listening already, hence clients can connect
+        write_uri_file(uri)
         print("Starting {}...".format(PyroServer.NAME))
         daemon.requestLoop(loopCondition=lambda: server.running)
 
         # no printing bc this clutters/blocks the command line
         # print("Stopping {}...".format(server_name))
-        ns.remove(PyroServer.NAME)
+        if options.name_server:
+            ns.remove(PyroServer.NAME)
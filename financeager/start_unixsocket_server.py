@@ -0,0 +1,143 @@
+import argparse
+import asyncio
+import concurrent.futures
+import fcntl
+import functools
+import json
+import os
+import sys
+import time
+
+from financeager.server import Server
+from financeager.storages import WalStorage
+from financeager.unixsocket import SOCKET_PATH, LOCK_FILE, is_running
+
+STORAGES = {"wal": WalStorage}
+
+# maximum size of a request line (f.i. 'add-many' with many entries)
+LINE_LIMIT = 2**26
+
+
+def parse_options():
+    parser = argparse.ArgumentParser(
+            description="Run the financeager period server on a Unix socket.")
+    parser.add_argument("--backend", choices=sorted(Server.BACKENDS),
+            default="tinydb", help="database backend of the periods")
+    parser.add_argument("--storage", choices=["json"] + list(STORAGES),
+            default="json", help="storage of the tinydb period databases")
+    parser.add_argument("--write-behind", action="store_true",
+            help="acknowledge writes from memory and persist them periodically")
+    parser.add_argument("--durable", action="store_true",
+            help="force every write to disk before acknowledging it")
+    parser.add_argument("--threads", type=int, default=None,
+            help="maximum number of threads serving requests concurrently")
+    return parser.parse_args()
+
+class _State(object):
+    """State shared by the connections of a running server."""
+
+    def __init__(self):
+        # set once 'stop' is requested; later requests are rejected
+        self.stopping = False
+        # set once the periods have been closed
+        self.stopped = asyncio.Event()
+        # futures of the commands running in the executor
+        self.pending = set()
+        # tasks serving the open connections
+        self.connections = set()
+
+def acquire_lock(path=LOCK_FILE, socket_path=SOCKET_PATH):
+    """Exclusively lock `path` for the lifetime of the process. A server
+    that is shutting down still holds the lock; wait until it has exited.
+
+    :return: the locked file, or None if another server accepts connections
+        at `socket_path`
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    lock_file = open(path, "a")
+    while True:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except (OSError):
+            if is_running(socket_path):
+                lock_file.close()
+                return None
+            time.sleep(0.01)
+        else:
+            return lock_file
+
+async def handle_connection(server, executor, state, reader, writer):
+    """Answer the requests of a client until it closes the connection or
+    requests 'stop'. Commands are run in the `executor`, hence clients are
+    served concurrently. 'stop' is run after all running commands have
+    finished; any later request is answered with an error."""
+    loop = asyncio.get_running_loop()
+    task = asyncio.current_task()
+    state.connections.add(task)
+    stopping = False
+    try:
+        while not stopping:
+            line = await reader.readline()
+            if not line:
+                break
+            try:
+                request = json.loads(line.decode("utf-8"))
+                command = request["command"]
+                kwargs = request.get("kwargs", {})
+            except (ValueError, KeyError, TypeError):
+                response = {"error": "Invalid request."}
+            else:
+                if state.stopping:
+                    response = {"error": "Server is stopping."}
+                else:
+                    if command == "stop":
+                        stopping = state.stopping = True
+                        if state.pending:
+                            await asyncio.wait(state.pending)
+                    future = loop.run_in_executor(executor,
+                            functools.partial(server.run, command, **kwargs))
+                    state.pending.add(future)
+                    future.add_done_callback(state.pending.discard)
+                    try:
+                        response = await future
+                    except Exception as e:
+                        response = {"error": "{}: {}".format(
+                            type(e).__name__, e)}
+            writer.write(json.dumps(response).encode("utf-8") + b"\n")
+            await writer.drain()
+    finally:
+        writer.close()
+        state.connections.discard(task)
+    if stopping:
+        state.stopped.set()
+
+async def serve(server, path, threads=None):
+    """Serve requests on the Unix socket `path` until 'stop' is requested.
+    The remaining connections are closed before returning."""
+    state = _State()
+    with concurrent.futures.ThreadPoolExecutor(threads) as executor:
+        unix_server = await asyncio.start_unix_server(
+                functools.partial(handle_connection, server, executor,
+                    state), path=path, limit=LINE_LIMIT)
+        async with unix_server:
+            await state.stopped.wait()
+            connections = list(state.connections)
+            for task in connections:
+                task.cancel()
+            await asyncio.gather(*connections, return_exceptions=True)
+    if os.path.exists(path):
+        os.remove(path)
+
+if __name__ == "__main__":
+    options = parse_options()
+    # binding would remove the socket file of a running server
+    lock_file = acquire_lock()
+    if lock_file is None:
+        sys.exit(0)
+
+    server_kwargs = dict(backend=options.backend,
+            write_behind=options.write_behind, durable=options.durable)
+    if options.backend == "tinydb" and options.storage in STORAGES:
+        server_kwargs["storage"] = STORAGES[options.storage]
+
+    asyncio.run(serve(Server(**server_kwargs), SOCKET_PATH, options.threads))
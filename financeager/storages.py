@@ -0,0 +1,219 @@
+"""Defines TinyDB storages used by the period databases."""
+
+from __future__ import unicode_literals
+
+import json
+import os
+import threading
+
+from tinydb import TinyDB, JSONStorage
+from tinydb.middlewares import Middleware
+
+
+class WalStorage(JSONStorage):
+    """
+    Store the data in a JSON snapshot file and append every modification to a
+    write-ahead log next to it (suffix ``.wal``).
+
+    The complete state is held in memory. On ``write``, the state is compared
+    to the previous one table by table and only the differences are appended
+    to the log, so the cost of a write does not depend on the size of the
+    snapshot file. Every ``CHECKPOINT_INTERVAL`` log records and on ``close``,
+    the log is folded into the snapshot. At initialization, the log of a
+    previous session that was not closed properly (f.i. due to a crash) is
+    replayed.
+
+    Log records are JSON lists, one per line:
+    ``["table", name]``, ``["drop", name]``, ``["set", name, id, element]``
+    and ``["del", name, id]``. Replaying them is idempotent.
+    """
+
+    CHECKPOINT_INTERVAL = 1000
+    LOG_SUFFIX = ".wal"
+
+    def __init__(self, path, **kwargs):
+        super(WalStorage, self).__init__(path, **kwargs)
+        self._path = path
+        self._log_path = path + self.LOG_SUFFIX
+
+        snapshot = super(WalStorage, self).read() or {}
+        self._data = {table: self._stringify_keys(values)
+                for table, values in snapshot.items()}
+
+        self._log_size = self._replay()
+        self._log = open(self._log_path, "a")
+
+    @staticmethod
+    def _stringify_keys(values):
+        # JSON object keys are strings whereas TinyDB uses integer IDs
+        return {str(k): v for k, v in values.items()}
+
+    def _replay(self):
+        """Apply the records of an existing log to the in-memory state. A
+        trailing incomplete record (interrupted write) is discarded.
+
+        :return: number of replayed records
+        """
+        if not os.path.exists(self._log_path):
+            return 0
+
+        count = 0
+        valid_size = 0
+        with open(self._log_path, "rb") as log:
+            for line in log:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line.decode("utf-8"))
+                except ValueError:
+                    break
+                self._apply(record)
+                count += 1
+                valid_size += len(line)
+
+        if valid_size < os.path.getsize(self._log_path):
+            with open(self._log_path, "ab") as log:
+                log.truncate(valid_size)
+
+        return count
+
+    def _apply(self, record):
+        operation, table = record[0], record[1]
+        if operation == "table":
+            self._data.setdefault(table, {})
+        elif operation == "drop":
+            self._data.pop(table, None)
+        elif operation == "set":
+            self._data.setdefault(table, {})[record[2]] = record[3]
+        elif operation == "del":
+            self._data.get(table, {}).pop(record[2], None)
+
+    def read(self):
+        # TinyDB modifies the returned dict in place before calling write(),
+        # hence a shallow copy is returned to be able to detect changes
+        return dict(self._data)
+
+    def write(self, data):
+        records = []
+        for table in set(self._data) - set(data):
+            records.append(["drop", table])
+
+        new_data = {}
+        for table, values in data.items():
+            old_values = self._data.get(table)
+            if values is old_values:
+                new_data[table] = values
+                continue
+
+            values = self._stringify_keys(values)
+            if old_values is None:
+                records.append(["table", table])
+                old_values = {}
+            for eid in set(old_values) - set(values):
+                records.append(["del", table, eid])
+            for eid, element in values.items():
+                if old_values.get(eid) != element:
+                    records.append(["set", table, eid, element])
+            new_data[table] = values
+
+        self._data = new_data
+        if not records:
+            return
+
+        self._log.write("".join(json.dumps(r) + "\n" for r in records))
+        self._log.flush()
+        self._log_size += len(records)
+
+        if self._log_size >= self.CHECKPOINT_INTERVAL:
+            self.checkpoint()
+
+    def checkpoint(self):
+        """Atomically replace the snapshot file by the current state, then
+        truncate the log."""
+        temp_path = self._path + ".tmp"
+        with open(temp_path, "w") as temp_file:
+            json.dump(self._data, temp_file, **self.kwargs)
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+        self._handle.close()
+        os.replace(temp_path, self._path)
+        self._handle = open(self._path, "r+")
+
+        self._log.truncate(0)
+        self._log.flush()
+        self._log_size = 0
+
+    def sync(self):
+        """Force the log to disk."""
+        os.fsync(self._log.fileno())
+
+    def close(self):
+        self.checkpoint()
+        self._log.close()
+        super(WalStorage, self).close()
+
+
+class BufferedMiddleware(Middleware):
+    """
+    Serve reads from memory and buffer writes to the underlying storage.
+
+    In write-behind mode, ``write`` only updates the in-memory state and
+    returns immediately; the state is persisted when ``flush`` is called
+    (typically by a background thread of the server) and on ``close``.
+    Otherwise the state is written through on every ``write``. If ``durable``
+    is set, write-behind is disabled and the written data is additionally
+    forced to disk (fsync) before ``write`` returns.
+
+    Access is guarded by a lock, so ``flush`` may be called from another
+    thread.
+    """
+
+    def __init__(self, storage_cls=TinyDB.DEFAULT_STORAGE, write_behind=True,
+            durable=False):
+        super(BufferedMiddleware, self).__init__(storage_cls)
+        self._write_behind = write_behind and not durable
+        self._durable = durable
+        self._cache = None
+        self._pending_writes = 0
+        self._lock = threading.RLock()
+
+    @property
+    def pending_writes(self):
+        """Number of writes that have not been persisted yet."""
+        return self._pending_writes
+
+    def read(self):
+        with self._lock:
+            if self._cache is None:
+                self._cache = self.storage.read() or {}
+            # TinyDB modifies the returned dict in place before calling write()
+            return dict(self._cache)
+
+    def write(self, data):
+        with self._lock:
+            self._cache = data
+            self._pending_writes += 1
+            if not self._write_behind:
+                self.flush()
+
+    def flush(self):
+        """Persist the in-memory state if modified."""
+        with self._lock:
+            if not self._pending_writes:
+                return
+            self.storage.write(self._cache)
+            if self._durable:
+                self._sync()
+            self._pending_writes = 0
+
+    def _sync(self):
+        sync = getattr(self.storage, "sync", None)
+        if sync is not None:
+            sync()
+        else:
+            os.fsync(self.storage._handle.fileno())
+
+    def close(self):
+        with self._lock:
+            self.flush()
+            self.storage.close()
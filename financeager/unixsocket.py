@@ -0,0 +1,139 @@
+"""
+Module for frontend-backend communication via a Unix domain socket.
+
+The server (see ``start_unixsocket_server.py``) listens on ``SOCKET_PATH``.
+Requests and responses are JSON objects, one per line: a request holds the
+``command`` and its ``kwargs``, the response is the return value of
+``Server.run``.
+
+As with the Pyro server, only one server runs at a time: it holds an
+exclusive lock on ``LOCK_FILE`` for its lifetime, and clients launching the
+server serialize on ``LAUNCH_LOCK_FILE``.
+"""
+from __future__ import unicode_literals
+
+import fcntl
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from financeager.period import CONFIG_DIR
+
+SOCKET_PATH = os.path.join(CONFIG_DIR, "financeager.sock")
+LOCK_FILE = os.path.join(CONFIG_DIR, "unixsocket-server.lock")
+# serializes clients launching the server
+LAUNCH_LOCK_FILE = os.path.join(CONFIG_DIR, "unixsocket-launch.lock")
+
+# seconds to wait for a response
+TIMEOUT = 60.0
+
+# seconds to wait for a launched server to accept connections
+LAUNCH_TIMEOUT = 5.0
+
+
+class CommunicationError(Exception):
+    pass
+
+
+def _connect(path=SOCKET_PATH):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except (OSError) as e:
+        sock.close()
+        raise CommunicationError("Server not reachable at {}: {}".format(
+            path, e))
+    sock.settimeout(TIMEOUT)
+    return sock
+
+
+def is_running(path=SOCKET_PATH):
+    """Return whether a server accepts connections at `path`."""
+    try:
+        _connect(path).close()
+    except (CommunicationError):
+        return False
+    return True
+
+
+def launch_server():
+    """
+    Launch the server via starting script if it is not running yet, and wait
+    until it accepts connections. Concurrent calls launch at most one server.
+
+    :raises: CommunicationError if the server does not come up in time
+    """
+    if is_running():
+        return
+
+    os.makedirs(CONFIG_DIR, exist_ok=True)
+    with open(LAUNCH_LOCK_FILE, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        # another client might have launched the server meanwhile
+        if is_running():
+            return
+
+        server_script_path = os.path.join(
+                os.path.dirname(os.path.abspath(__file__)),
+                "start_unixsocket_server.py")
+        # the server must not hold on to the output of the calling process
+        process = subprocess.Popen([sys.executable, server_script_path],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                start_new_session=True)
+
+        deadline = time.time() + LAUNCH_TIMEOUT
+        while not is_running():
+            if process.poll() not in (None, 0) or time.time() > deadline:
+                raise CommunicationError(
+                        "Server did not start within {}s".format(
+                            LAUNCH_TIMEOUT))
+            time.sleep(0.01)
+
+
+class _Proxy(object):
+    """
+    Sends commands to the server via a connection that is opened on first
+    use and kept for subsequent commands.
+    """
+
+    def __init__(self, path=SOCKET_PATH):
+        self._path = path
+        self._socket = None
+        self._file = None
+
+    def run(self, command, **kwargs):
+        """
+        :raises: CommunicationError if the server is not reachable or closes
+            the connection
+        :return: dict
+        """
+        if self._socket is None:
+            self._socket = _connect(self._path)
+            self._file = self._socket.makefile("rb")
+
+        request = json.dumps(dict(command=command, kwargs=kwargs))
+        try:
+            self._socket.sendall(request.encode("utf-8") + b"\n")
+            line = self._file.readline()
+        except (OSError) as e:
+            self.close()
+            raise CommunicationError(str(e))
+        if not line:
+            self.close()
+            raise CommunicationError("Connection closed by server")
+        return json.loads(line.decode("utf-8"))
+
+    def close(self):
+        if self._socket is not None:
+            self._file.close()
+            self._socket.close()
+            self._socket = None
+            self._file = None
+
+
+def proxy():
+    # all communication modules require this function
+    return _Proxy()
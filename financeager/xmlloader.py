@@ -0,0 +1,194 @@
+"""
+Module for streaming the entries of period XML files as written by
+``XmlPeriod.convert_to_xml``, i.e.
+
+    <period name="2017">
+    <model name="earnings"><entry name=".." value=".." date=".." category=".."/>
+    ...
+    </model>
+    <model name="expenses">...</model>
+    </period>
+
+Single ``<model>`` elements (``Model.convert_to_xml``) are read as well.
+Files of the former GUI (``FinanceagerWindow.saveToXML``) are read month by
+month with ``iter_gui_months``.
+Elements are discarded as soon as they have been processed, hence memory
+usage does not depend on the file size.
+"""
+from __future__ import unicode_literals
+
+import re
+import xml.etree.ElementTree as ET
+from datetime import date as _date
+
+from financeager import DATE_FORMAT
+from financeager.rendering import Table
+
+# number of entries passed to a period or model at once
+CHUNK_SIZE = 5000
+
+# GUI entries store the day of the month as 'dd.'
+_DAY_REGEX = re.compile(r"^\s*(\d{1,2})\.?\s*$")
+
+
+def _iterparse(source):
+    """Wrapper around ET.iterparse generating start and end events.
+
+    :raises: ValueError if the XML is malformed
+    """
+    try:
+        for event, element in ET.iterparse(source, events=("start", "end")):
+            yield event, element
+    except ET.ParseError as e:
+        raise ValueError("Invalid XML: {}".format(e))
+
+
+class PeriodXmlReader(object):
+    """Iterable generating the entries of the XML file `source` (file name or
+    file object) as dicts with the fields `name`, `value`, `date` and
+    `category`. Values of entries in the expenses model are negative.
+    The period name is available as `name` once iteration has started.
+    """
+
+    def __init__(self, source):
+        self._source = source
+        self.name = None
+
+    def __iter__(self):
+        # elements whose children are removed once processed
+        parents = []
+        sign = 1
+        for event, element in _iterparse(self._source):
+            if event == "start":
+                if element.tag == "period":
+                    self.name = element.get("name")
+                elif element.tag == "model":
+                    sign = -1 if element.get("name") == "expenses" else 1
+                if element.tag in ("period", "model"):
+                    parents.append(element)
+                continue
+
+            if element.tag == "entry":
+                attrib = element.attrib
+                yield dict(name=attrib["name"],
+                        value=sign * abs(float(attrib["value"])),
+                        date=attrib.get("date"),
+                        category=attrib.get("category"))
+            elif element.tag in ("period", "model"):
+                parents.pop()
+            else:
+                continue
+            if parents:
+                # processed elements are the first children of their parent
+                parents[-1].remove(element)
+
+
+def iter_gui_months(source):
+    """Generate the entries of the XML file `source` (file name or file
+    object) written by the former GUI, one month at a time. The file is
+    structured as
+
+        <root name="year" value="2014">
+        <tab name="month" value="January">
+        <model name="expenditures" value=".."><category name=".." value="..">
+        <entry name=".." value=".." date="dd."/>
+        ...
+        </category></model>
+        <model name="receipts" value="..">...</model>
+        </tab>
+        ...
+        </root>
+
+    where months are given in order. Values of expenditures are negative.
+
+    :raises: ValueError if the XML is malformed, or the year or a day can
+        not be parsed
+    :return: generator yielding tuples of year, month number (starting at
+        1) and list of entry dicts with the fields `name`, `value`, `date`
+        and `category`
+    """
+    elements = []
+    year = None
+    month = 0
+    entries = []
+    sign = -1
+    category = None
+    for event, element in _iterparse(source):
+        if event == "start":
+            elements.append(element)
+            depth = len(elements)
+            if depth == 1:
+                try:
+                    year = int(element.get("value"))
+                except (TypeError, ValueError):
+                    raise ValueError("Invalid year: {}".format(
+                        element.get("value")))
+            elif depth == 2:
+                month += 1
+                entries = []
+                models = 0
+            elif element.tag == "model":
+                # expenditures are written first
+                name = element.get("name")
+                sign = -1 if name == "expenditures" or (
+                        name != "receipts" and models == 0) else 1
+                models += 1
+            elif element.tag == "category":
+                category = element.get("name")
+            continue
+
+        elements.pop()
+        if element.tag == "entry":
+            match = _DAY_REGEX.match(element.get("date", ""))
+            try:
+                date = _date(year, month, int(match.group(1)))
+            except (AttributeError, ValueError):
+                raise ValueError("Invalid day '{}' in month {}".format(
+                    element.get("date"), month))
+            entries.append(dict(name=element.get("name"),
+                value=sign * abs(float(element.get("value"))),
+                date=date.strftime(DATE_FORMAT), category=category))
+        elif len(elements) == 1:
+            yield year, month, entries
+        if elements:
+            elements[-1].remove(element)
+
+
+def iter_chunks(entries, chunk_size=CHUNK_SIZE):
+    """Generate lists of at most `chunk_size` consecutive entries."""
+    chunk = []
+    for entry in entries:
+        chunk.append(entry)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def load_into_period(period, source, chunk_size=CHUNK_SIZE):
+    """Add the entries of the XML file `source` to `period` (f.i. a
+    TinyDbPeriod), passing at most `chunk_size` entries to its
+    ``add_entries`` method at once.
+
+    :return: number of added entries
+    """
+    count = 0
+    for chunk in iter_chunks(PeriodXmlReader(source), chunk_size):
+        period.add_entries(chunk)
+        count += len(chunk)
+    return count
+
+
+def load_tables(source):
+    """Read the entries of the XML file `source` into Qt-free tables (see
+    financeager.rendering.Table).
+
+    :return: tuple of earnings and expenses table
+    """
+    tables = (Table("Earnings"), Table("Expenses"))
+    for entry in PeriodXmlReader(source):
+        table = tables[0] if entry["value"] > 0 else tables[1]
+        table.add_entry(entry["name"], entry["value"], entry["date"],
+                category=entry["category"])
+    return tables
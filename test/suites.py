@@ -7,8 +7,15 @@ modules = [
         'test_items',
         'test_entries',
         'test_model',
+        'test_rendering',
+        'test_index',
+        'test_storages',
+        'test_recurrence',
         'test_period',
         'test_server',
+        'test_importer',
+        'test_xmlloader',
+        'test_unixsocket',
         'test_webservice',
         'test_cli'
         ]
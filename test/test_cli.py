@@ -3,19 +3,53 @@ from __future__ import unicode_literals
 import unittest
 
 from financeager.server import CONFIG_DIR
-from financeager.cli import Cli
+from financeager.cli import Cli, MIGRATION_PROGRESS_FILE
+from financeager.main import parse_entries
+from financeager.pyro import server_uri, write_uri_file, URI_FILE, LOCK_FILE, \
+    LAUNCH_LOCK_FILE
+from financeager.start_server import acquire_lock
 import psutil
 import os
+import io
+import json
+import shutil
+import tempfile
 import signal
 import subprocess
+import sys
+from unittest import mock
 
 
 def suite():
     suite = unittest.TestSuite()
     tests = [
-            'test_servers_running'
+            'test_servers_running',
+            'test_launch_when_running'
             ]
     suite.addTest(unittest.TestSuite(map(StartCliTestCase, tests)))
+    tests = [
+            'test_server_uri',
+            'test_stale_uri_file',
+            'test_no_uri_file',
+            'test_acquire_lock'
+            ]
+    suite.addTest(unittest.TestSuite(map(UriFileTestCase, tests)))
+    tests = [
+            'test_fresh_config_dir'
+            ]
+    suite.addTest(unittest.TestSuite(map(FreshInstallTestCase, tests)))
+    tests = [
+            'test_only_periods_listed'
+            ]
+    suite.addTest(unittest.TestSuite(map(ListTestCase, tests)))
+    tests = [
+            'test_parse_entries'
+            ]
+    suite.addTest(unittest.TestSuite(map(ParseEntriesTestCase, tests)))
+    tests = [
+            'test_qt_not_imported'
+            ]
+    suite.addTest(unittest.TestSuite(map(HeadlessStartupTestCase, tests)))
     return suite
 
 class StartCliTestCase(unittest.TestCase):
@@ -23,44 +57,144 @@ class StartCliTestCase(unittest.TestCase):
         cl_kwargs = {"command": "add", "name": "foo", "value": 19, "period": "0"}
         self.cli = Cli(cl_kwargs)
         self.cli()
-        ps_process = subprocess.Popen(["ps", "aux"], stdout=subprocess.PIPE)
-        self.python_processes = subprocess.check_output(["grep", "python"],
-                stdin=ps_process.stdout).splitlines()
-        # check_output returns byte strings, hence prefix strings being searched for
-        self.server_pid = self.find_pid_by_name(b"start_server.py")
-        self.name_server_pid = self.find_pid_by_name(b"Pyro4.naming")
-
-    def find_pid_by_name(self, name):
-        for process in self.python_processes:
-            if process.find(name) > -1:
-                return int(process.split()[1])
-        return None
+        # the server signals readiness via the URI file
+        with open(URI_FILE) as file:
+            self.server_pid = json.load(file)["pid"]
+
+    def find_python_processes(self, argument):
+        return [p for p in psutil.process_iter(["cmdline"])
+                if "python" in os.path.basename((p.info["cmdline"] or [""])[0])
+                and any(a.endswith(argument) for a in p.info["cmdline"][1:])]
 
     def test_servers_running(self):
-        # sleep a bit to see output from server launches
-        import time; time.sleep(1)
-        running = True
-        if self.server_pid is None:
-            running = False
-        else:
-            try:
-                os.kill(self.server_pid, 0)
-            except (OSError) as e:
-                running = False
-        self.assertTrue(running)
-        if self.name_server_pid is None:
-            running = False
-        else:
-            try:
-                os.kill(self.name_server_pid, 0)
-            except (OSError) as e:
-                running = False
-        self.assertTrue(running)
+        self.assertTrue(psutil.pid_exists(self.server_pid))
+        self.assertListEqual([p.pid for p in
+            self.find_python_processes("start_server.py")], [self.server_pid])
+        # clients connect directly, no name server required
+        self.assertListEqual(self.find_python_processes("Pyro4.naming"), [])
+
+    def test_launch_when_running(self):
+        uri = server_uri()
+        self.cli._cl_kwargs = dict(command="print", period="0")
+        self.cli()
+        self.assertEqual(server_uri(), uri)
 
     def tearDown(self):
         self.cli._cl_kwargs = dict(command="stop", period="0")
         self.cli()
+        # the server process is a child of the test process
+        psutil.Process(self.server_pid).wait(5)
         os.remove(os.path.join(CONFIG_DIR, "0.json"))
 
+class UriFileTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "pyro-server.uri")
+        self.lock_path = os.path.join(self.tmp_dir, "pyro-server.lock")
+
+    def test_server_uri(self):
+        lock_file = acquire_lock(self.lock_path, self.path)
+        write_uri_file("PYRO:obj@localhost:1234", path=self.path)
+        self.assertEqual(server_uri(self.path, self.lock_path),
+                "PYRO:obj@localhost:1234")
+        self.assertListEqual(sorted(os.listdir(self.tmp_dir)),
+                ["pyro-server.lock", "pyro-server.uri"])
+        lock_file.close()
+
+    def test_stale_uri_file(self):
+        # the recorded process is alive (f.i. its pid has been reused), but
+        # no server holds the lock
+        write_uri_file("PYRO:obj@localhost:1234", path=self.path)
+        self.assertIsNone(server_uri(self.path, self.lock_path))
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_no_uri_file(self):
+        self.assertIsNone(server_uri(self.path, self.lock_path))
+
+    def test_acquire_lock(self):
+        write_uri_file("PYRO:obj@localhost:1234", path=self.path)
+        lock_file = acquire_lock(self.lock_path, self.path)
+        # stale URI file removed
+        self.assertFalse(os.path.exists(self.path))
+        write_uri_file("PYRO:obj@localhost:1234", path=self.path)
+        self.assertIsNone(acquire_lock(self.lock_path, self.path))
+        lock_file.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+class FreshInstallTestCase(unittest.TestCase):
+    def setUp(self):
+        self.home = tempfile.mkdtemp()
+        self.env = dict(os.environ, HOME=self.home)
+        self.config_dir = os.path.join(self.home, ".config", "financeager")
+
+    def run_cli(self, *args):
+        return subprocess.check_output(
+                [sys.executable, "-m", "financeager.main"] + list(args),
+                env=self.env, stderr=subprocess.STDOUT,
+                universal_newlines=True)
+
+    def test_fresh_config_dir(self):
+        self.run_cli("add", "Shoes", "-100", "-p", "0")
+        output = self.run_cli("print", "-p", "0")
+        self.assertIn("Shoes", output)
+        with open(os.path.join(self.config_dir, "pyro-server.uri")) as file:
+            server = psutil.Process(json.load(file)["pid"])
+        self.run_cli("stop")
+        server.wait(5)
+
+    def tearDown(self):
+        shutil.rmtree(self.home)
+
+class ListTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def test_only_periods_listed(self):
+        for path in ["2017.json", "2018.db", MIGRATION_PROGRESS_FILE, URI_FILE,
+                LOCK_FILE, LAUNCH_LOCK_FILE]:
+            filename = os.path.basename(path)
+            open(os.path.join(self.tmp_dir, filename), "w").close()
+        with mock.patch("financeager.cli.CONFIG_DIR", self.tmp_dir), \
+                mock.patch("sys.stdout", new_callable=io.StringIO) as stdout:
+            Cli(dict(command="list"))()
+        self.assertListEqual(sorted(stdout.getvalue().splitlines()),
+                ["2017", "2018"])
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+class ParseEntriesTestCase(unittest.TestCase):
+    def test_parse_entries(self):
+        lines = [
+                "# receipts",
+                "'ice cream' -4.5 -c sweets -d 2017-08-01",
+                "",
+                "rent -500 -r monthly 2017-01-01",
+                ]
+        entries = parse_entries(lines)
+        self.assertEqual(len(entries), 2)
+        self.assertDictEqual(entries[0], dict(name="ice cream", value=-4.5,
+            category="sweets", date="2017-08-01", repetitive=False))
+        self.assertListEqual(entries[1]["repetitive"],
+                ["monthly", "2017-01-01"])
+
+class HeadlessStartupTestCase(unittest.TestCase):
+    def test_qt_not_imported(self):
+        # run in a fresh interpreter, the test process may have imported Qt
+        script = "\n".join([
+            "import sys, time",
+            "start = time.time()",
+            "import financeager.main, financeager.server, financeager.period",
+            "print('{:.3f}'.format(time.time() - start))",
+            "print(','.join(m for m in sys.modules if m.startswith('PyQt')))",
+            ])
+        output = subprocess.check_output([sys.executable, "-c", script],
+                universal_newlines=True)
+        duration, qt_modules = output.splitlines()
+        self.assertEqual(qt_modules, "",
+                "Qt imported on CLI path (startup took {}s)".format(duration))
+
 if __name__ == '__main__':
     unittest.main()
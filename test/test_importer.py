@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import unittest
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from tinydb import storages
+from financeager.importer import read_entries, import_entries, \
+        migrate_gui_xml
+from financeager.server import Server
+from financeager.period import Period
+
+
+def suite():
+    suite = unittest.TestSuite()
+    tests = [
+            'test_read_entries',
+            'test_read_entries_custom_format',
+            'test_missing_column',
+            'test_invalid_value'
+            ]
+    suite.addTest(unittest.TestSuite(map(ReadEntriesTestCase, tests)))
+    tests = [
+            'test_import_routed_by_year',
+            'test_import_in_chunks',
+            'test_undated_entries_in_default_period'
+            ]
+    suite.addTest(unittest.TestSuite(map(ImportEntriesTestCase, tests)))
+    tests = [
+            'test_migrate',
+            'test_resume',
+            'test_migrated_months_skipped',
+            'test_restart'
+            ]
+    suite.addTest(unittest.TestSuite(map(MigrateGuiXmlTestCase, tests)))
+    return suite
+
+class ReadEntriesTestCase(unittest.TestCase):
+    def test_read_entries(self):
+        file = io.StringIO(
+                "date,name,value\n"
+                "2017-01-02,Aldi,-12.34\n"
+                ",salary,2000\n")
+        entries = list(read_entries(file))
+        self.assertListEqual(entries, [
+            dict(name="Aldi", value=-12.34, date="2017-01-02", category=None),
+            dict(name="salary", value=2000, date=None, category=None)])
+
+    def test_read_entries_custom_format(self):
+        file = io.StringIO(
+                "Buchungstag;Empfänger;Betrag;Kategorie\n"
+                "02.01.2017;Aldi;-1.012,34;Groceries\n")
+        entries = list(read_entries(file, name_column="Empfänger",
+            value_column="Betrag", date_column="Buchungstag",
+            category_column="Kategorie", delimiter=";",
+            date_format="%d.%m.%Y", decimal_comma=True))
+        self.assertListEqual(entries, [dict(name="Aldi", value=-1012.34,
+            date="2017-01-02", category="Groceries")])
+
+    def test_missing_column(self):
+        file = io.StringIO("name,value\nAldi,-12.34\n")
+        self.assertRaises(ValueError, list, read_entries(file))
+
+    def test_invalid_value(self):
+        file = io.StringIO("date,name,value\n2017-01-02,Aldi,a lot\n")
+        with self.assertRaisesRegex(ValueError, "Line 2"):
+            list(read_entries(file))
+
+class ImportEntriesTestCase(unittest.TestCase):
+    def setUp(self):
+        self.server = Server(storage=storages.MemoryStorage)
+
+    def test_import_routed_by_year(self):
+        entries = [
+                dict(name="Aldi", value=-12.34, date="2017-12-31"),
+                dict(name="Lidl", value=-5, date="2018-01-01"),
+                dict(name="salary", value=2000, date=None),
+                ]
+        counts = import_entries(self.server, entries, period="2018")
+        self.assertDictEqual(counts, {"2017": 1, "2018": 2})
+        self.assertEqual(len(self.server.run("print", period="2018")[
+            "elements"]), 2)
+
+    def test_import_in_chunks(self):
+        entries = (dict(name="coffee", value=-2, date="2017-01-01")
+                for _ in range(25))
+        with mock.patch.object(self.server, "run",
+                wraps=self.server.run) as run:
+            counts = import_entries(self.server, entries, chunk_size=10)
+        self.assertDictEqual(counts, {"2017": 25})
+        self.assertListEqual([len(c[1]["entries"]) for c in run.call_args_list],
+                [10, 10, 5])
+
+    def test_undated_entries_in_default_period(self):
+        year = str(Period.DEFAULT_NAME)
+        entries = [
+                dict(name="Aldi", value=-12.34, date=None),
+                dict(name="Lidl", value=-5, date="{}-01-01".format(year)),
+                ]
+        counts = import_entries(self.server, entries)
+        self.assertDictEqual(counts, {year: 2})
+        self.server.run("add", name="Rewe", value=-3)
+        self.assertEqual(len(self.server.run("print", period=year)[
+            "elements"]), 3)
+
+    def tearDown(self):
+        self.server.run("stop")
+
+GUI_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<root name="year" value="2014" autoSave="False">
+    <tab name="month" value="January">
+        <model name="expenditures" value="12.34">
+            <category name="Groceries" value="12.34">
+                <entry name="Aldi" value="12.34" date="03."/>
+            </category>
+        </model>
+        <model name="receipts" value="100">
+            <category name="Salary" value="100">
+                <entry name="Work" value="100" date="31."/>
+            </category>
+        </model>
+    </tab>
+    <tab name="month" value="February">
+        <model name="expenditures" value="5">
+            <category name="Groceries" value="5">
+                <entry name="Lidl" value="5" date="14."/>
+            </category>
+        </model>
+        <model name="receipts" value="0"/>
+    </tab>
+</root>
+"""
+
+class MigrateGuiXmlTestCase(unittest.TestCase):
+    def setUp(self):
+        self.server = Server(storage=storages.MemoryStorage)
+        self.tmp_dir = tempfile.mkdtemp()
+        self.source = os.path.join(self.tmp_dir, "2014.xml")
+        with open(self.source, "w") as file:
+            file.write(GUI_XML)
+        self.progress_file = os.path.join(self.tmp_dir, "migration.progress")
+
+    def migrate(self, **kwargs):
+        return migrate_gui_xml(self.server, self.source, self.progress_file,
+                **kwargs)
+
+    def test_migrate(self):
+        report = mock.Mock()
+        self.assertEqual(self.migrate(report=report), 3)
+        self.assertListEqual([c[0][:3] for c in report.call_args_list],
+                [(2014, 1, 2), (2014, 2, 1)])
+        elements = self.server.run("print", period="2014")["elements"]
+        self.assertSetEqual({(e["name"], e["value"], e["date"], e["category"])
+            for e in elements}, {
+                ("aldi", -12.34, "2014-01-03", "groceries"),
+                ("work", 100, "2014-01-31", "salary"),
+                ("lidl", -5, "2014-02-14", "groceries")})
+
+    def test_resume(self):
+        run = self.server.run
+        def run_failing(command, **kwargs):
+            # server fails on the entries of February
+            if kwargs["entries"][0]["date"].startswith("2014-02"):
+                return {"error": "Disk full."}
+            return run(command, **kwargs)
+        with mock.patch.object(self.server, "run", side_effect=run_failing):
+            self.assertRaises(ValueError, self.migrate)
+        self.assertEqual(self.migrate(), 1)
+        self.assertEqual(len(self.server.run("print", period="2014")[
+            "elements"]), 3)
+
+    def test_migrated_months_skipped(self):
+        self.migrate()
+        self.assertEqual(self.migrate(), 0)
+
+    def test_restart(self):
+        self.migrate()
+        self.assertEqual(self.migrate(restart=True), 3)
+
+    def tearDown(self):
+        self.server.run("stop")
+        shutil.rmtree(self.tmp_dir)
+
+if __name__ == '__main__':
+    unittest.main()
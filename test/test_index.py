@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import unittest
+
+from financeager.index import TrigramIndex
+
+
+def suite():
+    suite = unittest.TestSuite()
+    tests = [
+            'test_candidates',
+            'test_candidates_multiple_fields',
+            'test_no_match',
+            'test_short_query_not_narrowing',
+            'test_regex_query_not_narrowing',
+            'test_remove'
+            ]
+    suite.addTest(unittest.TestSuite(map(TrigramIndexTestCase, tests)))
+    return suite
+
+class TrigramIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        self.index = TrigramIndex(("name", "category"))
+        self.index.add(1, dict(name="coffee", category="food"))
+        self.index.add(2, dict(name="toffee", category="food"))
+        self.index.add(3, dict(name="rent", category="housing"))
+
+    def test_candidates(self):
+        self.assertSetEqual(self.index.candidates(name="ffee"), {1, 2})
+        self.assertSetEqual(self.index.candidates(name="coffee"), {1})
+
+    def test_candidates_multiple_fields(self):
+        self.assertSetEqual(
+                self.index.candidates(name="ffee", category="housing"), set())
+        self.assertSetEqual(
+                self.index.candidates(fields=["category"], name="ffee",
+                    category="food"), {1, 2})
+
+    def test_no_match(self):
+        self.assertSetEqual(self.index.candidates(name="tea"), set())
+
+    def test_short_query_not_narrowing(self):
+        self.assertIsNone(self.index.candidates(name="re"))
+        self.assertIsNone(self.index.candidates())
+
+    def test_regex_query_not_narrowing(self):
+        self.assertIsNone(self.index.candidates(name="co.fee"))
+
+    def test_remove(self):
+        self.index.remove(1, dict(name="coffee", category="food"))
+        self.assertSetEqual(self.index.candidates(name="ffee"), {2})
+        self.assertEqual(len(self.index), 2)
+
+if __name__ == '__main__':
+    unittest.main()
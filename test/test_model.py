@@ -58,6 +58,38 @@ def suite():
             'test_category_sum'
             ]
     suite.addTest(unittest.TestSuite(map(RemoveEntryTestCase, tests)))
+    tests = [
+            'test_categories_indexed',
+            'test_remove_category_row',
+            'test_clear',
+            'test_category_with_whitespace'
+            ]
+    suite.addTest(unittest.TestSuite(map(CategoryIndexTestCase, tests)))
+    tests = [
+            'test_modify_value',
+            'test_remove_entry_row',
+            'test_remove_category_row',
+            'test_clear',
+            'test_recompute_sums'
+            ]
+    suite.addTest(unittest.TestSuite(map(SumMaintenanceTestCase, tests)))
+    tests = [
+            'test_sums',
+            'test_existing_category',
+            'test_insertion_order',
+            'test_whitespace_in_category',
+            'test_signals'
+            ]
+    suite.addTest(unittest.TestSuite(map(AddEntriesTestCase, tests)))
+    tests = [
+            'test_duplicates',
+            'test_date_first',
+            'test_remove_duplicate',
+            'test_modify_name',
+            'test_modify_date',
+            'test_remove_category_row'
+            ]
+    suite.addTest(unittest.TestSuite(map(NameIndexTestCase, tests)))
     tests = [
             'test_category_item_names',
             'test_category_sums',
@@ -239,6 +271,178 @@ class RemoveEntryTestCase(unittest.TestCase):
         self.assertAlmostEqual(self.model.category_sum(self.item_category),
                 self.item_b_value, places=5)
 
+class CategoryIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        self.model = Model()
+        self.model.add_entry(BaseEntry("Aldi", 66.6), "Groceries")
+        self.model.add_entry(BaseEntry("Rewe", 10.01), "groceries")
+        self.model.add_entry(BaseEntry("Rent", 500), "Housing")
+
+    def test_categories_indexed(self):
+        self.assertEqual(self.model.rowCount(), 2)
+        self.assertEqual(self.model.find_category_item("GROCERIES").rowCount(),
+                2)
+        self.assertSetEqual(set(self.model._category_items),
+                set(self.model.category_entry_names))
+
+    def test_remove_category_row(self):
+        self.model.removeRow(0)
+        self.assertIsNone(self.model.find_category_item("groceries"))
+        self.model.add_entry(BaseEntry("Aldi", 1), "Groceries")
+        self.assertAlmostEqual(self.model.category_sum("groceries"), 1)
+        self.assertEqual(self.model.rowCount(), 2)
+
+    def test_clear(self):
+        self.model.clear()
+        self.assertIsNone(self.model.find_category_item("housing"))
+
+    def test_category_with_whitespace(self):
+        self.model.add_entry(BaseEntry("Bus", 2), "public  transport")
+        self.model.add_entry(BaseEntry("Train", 3), "public  transport")
+        self.assertAlmostEqual(
+                self.model.category_sum("public transport"), 5)
+
+class SumMaintenanceTestCase(unittest.TestCase):
+    def setUp(self):
+        self.model = Model()
+        self.model.add_entry(BaseEntry("Aldi", 66.6), "Groceries")
+        self.model.add_entry(BaseEntry("Rewe", 10.01), "Groceries")
+        self.model.add_entry(BaseEntry("Rent", 500), "Housing")
+
+    def test_modify_value(self):
+        item = self.model.find_name_item(name="rewe", category="groceries")
+        item.entry.value_item.setText("20.01")
+        self.assertAlmostEqual(self.model.category_sum("groceries"), 86.61)
+        self.assertAlmostEqual(self.model.total_value(), 586.61)
+
+    def test_remove_entry_row(self):
+        item = self.model.find_name_item(name="aldi", category="groceries")
+        self.model.removeRow(item.row(), item.index().parent())
+        self.assertAlmostEqual(self.model.category_sum("groceries"), 10.01)
+        self.assertAlmostEqual(self.model.total_value(), 510.01)
+
+    def test_remove_category_row(self):
+        self.model.removeRow(0)
+        self.assertAlmostEqual(self.model.total_value(), 500)
+
+    def test_clear(self):
+        self.model.clear()
+        self.assertEqual(self.model.total_value(), 0)
+
+    def test_recompute_sums(self):
+        item = self.model.find_name_item(name="rent", category="housing")
+        item.entry.value_item.setText("450")
+        self.assertAlmostEqual(self.model.recompute_sums(),
+                self.model.total_value())
+        self.assertAlmostEqual(self.model.category_sum("housing"), 450)
+
+class AddEntriesTestCase(unittest.TestCase):
+    def setUp(self):
+        self.model = Model()
+        self.model.add_entry(BaseEntry("Rent", 500), "Housing")
+        self.elements = [
+                dict(name="Aldi", value=66.6, category="Groceries"),
+                dict(name="Gas", value=30.12),
+                dict(name="Rewe", value=10.01, category="groceries"),
+                dict(name="Repair", value=99.9, category="housing",
+                    date="2017-01-01")
+                ]
+
+    def test_sums(self):
+        self.model.add_entries(self.elements)
+        self.assertAlmostEqual(self.model.category_sum("groceries"), 76.61)
+        self.assertAlmostEqual(self.model.category_sum("housing"), 599.9)
+        self.assertAlmostEqual(
+                self.model.category_sum(CategoryItem.DEFAULT_NAME), 30.12)
+        self.assertAlmostEqual(self.model.total_value(), 706.63)
+        self.assertAlmostEqual(self.model.recompute_sums(),
+                self.model.total_value())
+
+    def test_existing_category(self):
+        self.model.add_entries(self.elements)
+        self.assertEqual(self.model.rowCount(), 3)
+        self.assertEqual(self.model.find_category_item("housing").rowCount(),
+                2)
+        self.assertIsNotNone(self.model.find_name_item(name="repair",
+            date="2017-01-01", category="housing"))
+
+    def test_insertion_order(self):
+        other = Model()
+        other.add_entry(BaseEntry("Rent", 500), "Housing")
+        for element in self.elements:
+            other.add_entry(BaseEntry(element["name"], element["value"],
+                element.get("date")), element.get("category"))
+        self.model.add_entries(self.elements)
+        self.assertEqual(str(self.model), str(other))
+
+    def test_whitespace_in_category(self):
+        elements = [
+                dict(name="Aldi", value=66.6, category="Food  Stuff"),
+                dict(name="Rewe", value=10.01, category="food stuff"),
+                dict(name="Repair", value=99.9, category=" Housing ")
+                ]
+        other = Model()
+        other.add_entry(BaseEntry("Rent", 500), "Housing")
+        for element in elements:
+            other.add_entry(BaseEntry(element["name"], element["value"]),
+                    element["category"])
+        self.model.add_entries(elements)
+        self.assertEqual(self.model.rowCount(), 2)
+        self.assertEqual(str(self.model), str(other))
+        self.assertAlmostEqual(self.model.category_sum("food stuff"), 76.61)
+
+    def test_signals(self):
+        emitted = []
+        self.model.itemChanged.connect(lambda *args: emitted.append(args))
+        self.model.rowsInserted.connect(lambda *args: emitted.append(args))
+        self.model.modelReset.connect(lambda: emitted.append("reset"))
+        self.model.add_entries(self.elements)
+        self.assertListEqual(emitted, ["reset"])
+
+class NameIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        self.model = Model()
+        self.date = "2017-01-01"
+        self.base_entry_a = BaseEntry("Aldi", 66.6, self.date)
+        self.base_entry_b = BaseEntry("Aldi", 1.0, self.date)
+        self.model.add_entry(self.base_entry_a, "Groceries")
+        self.model.add_entry(self.base_entry_b, "Groceries")
+
+    def find(self, name="aldi", date=None):
+        return self.model.find_name_item(name=name,
+                date=self.date if date is None else date, category="groceries")
+
+    def test_duplicates(self):
+        self.assertEqual(self.find(), self.base_entry_a.name_item)
+
+    def test_date_first(self):
+        self.assertEqual(self.model.find_name_item(date=self.date,
+            value="aldi", category="groceries"), self.base_entry_a.name_item)
+
+    def test_remove_duplicate(self):
+        self.model.remove_entry(self.base_entry_a, "groceries")
+        self.assertEqual(self.find(), self.base_entry_b.name_item)
+        self.model.remove_entry(self.base_entry_b, "groceries")
+        self.assertIsNone(self.find())
+        self.assertAlmostEqual(self.model.category_sum("groceries"), 0)
+
+    def test_modify_name(self):
+        self.base_entry_a.name_item.setText("Lidl")
+        self.assertEqual(self.find(), self.base_entry_b.name_item)
+        self.assertEqual(self.find(name="lidl"), self.base_entry_a.name_item)
+
+    def test_modify_date(self):
+        self.base_entry_b.date_item.setText("2017-02-01")
+        self.assertEqual(self.find(date="2017-02-01"),
+                self.base_entry_b.name_item)
+        self.model.remove_entry(self.base_entry_a, "groceries")
+        self.assertIsNone(self.find())
+
+    def test_remove_category_row(self):
+        self.model.removeRow(0)
+        self.model.add_entry(BaseEntry("Rewe", 1.0, self.date), "Groceries")
+        self.assertIsNone(self.find())
+
 class XmlConversionTestCase(unittest.TestCase):
     def setUp(self):
         self.model = Model()
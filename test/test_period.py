@@ -3,8 +3,11 @@ from __future__ import unicode_literals
 import unittest
 
 import xml.etree.ElementTree as ET
+from unittest import mock
 from tinydb import database, Query, storages
-from financeager.period import XmlPeriod, TinyDbPeriod
+from financeager.period import XmlPeriod, TinyDbPeriod, SqlitePeriod, \
+        CONFIG_DIR
+from financeager.storages import WalStorage
 from financeager.model import Model
 from financeager.entries import BaseEntry
 from financeager.items import CategoryItem
@@ -35,9 +38,42 @@ def suite():
             'test_repetitive_entries',
             'test_repetitive_quarter_yearly_entries'
             ,'test_category_cache',
-            'test_remove_nonexisting_entry'
+            'test_remove_nonexisting_entry',
+            'test_indices',
+            'test_repetitive_cache',
+            'test_repetitive_cache_invalidation',
+            'test_repetitive_predicate_pushdown',
+            'test_repetitive_date_range',
+            'test_iter_entries',
+            'test_iter_table',
+            'test_find_entry_limit',
+            'test_add_entries',
+            'test_remove_entries',
+            'test_summary',
+            'test_summary_repetitive_cutoff',
+            'test_summary_repetitive_removed'
             ]
     suite.addTest(unittest.TestSuite(map(TinyDbPeriodTestCase, tests)))
+    tests = [
+            'test_repetitive_counted_on_reopen',
+            'test_sqlite_repetitive_counted_on_reopen'
+            ]
+    suite.addTest(unittest.TestSuite(map(CategoryCacheReopenTestCase, tests)))
+    tests = [
+            'test_find_entry',
+            'test_remove_entry',
+            'test_create_models_query_kwargs',
+            'test_repetitive_entries',
+            'test_category_cache',
+            'test_remove_nonexisting_entry',
+            'test_regex_query',
+            'test_write_behind',
+            'test_iter_entries',
+            'test_add_entries',
+            'test_remove_entries',
+            'test_summary'
+            ]
+    suite.addTest(unittest.TestSuite(map(SqlitePeriodTestCase, tests)))
     return suite
 
 class CreateEmptyPeriodTestCase(unittest.TestCase):
@@ -169,10 +205,398 @@ class TinyDbPeriodTestCase(unittest.TestCase):
         self.assertEqual(len(groceries_elements), 2)
         self.assertEqual(sum([e["value"] for e in groceries_elements]), -51)
 
+    def test_add_entries(self):
+        entries = [
+                dict(name="Walmart", value=-50.01, category="Groceries",
+                    date="1901-02-02"),
+                dict(name="rent", value=-500,
+                    repetitive=["monthly", "1901-10-01"]),
+                dict(name="walmart", value=-0.99, date="1901-02-03"),
+                ]
+        # creating a table takes a write
+        self.period.table("repetitive")
+        with mock.patch.object(self.period._storage, "write",
+                wraps=self.period._storage.write) as write:
+            response = self.period.add_entries(entries)
+        self.assertListEqual(response["ids"], [2, 1, 3])
+        # one write per table
+        self.assertEqual(write.call_count, 2)
+        self.assertEqual(self.period.get(eid=3)["category"], "groceries")
+        self.assertEqual(len(self.period.find_entry(name="walmart")), 2)
+        self.assertEqual(len(self.period.find_entry(name="rent")), 3)
+
+    def test_remove_entries(self):
+        for day in range(2, 6):
+            self.period.add_entry(name="coffee", value=-2, category="Drinks",
+                    date="1901-01-0{}".format(day))
+        self.period.add_entry(name="coffee", value=-20,
+                repetitive=["monthly", "1901-10-01"])
+
+        response = self.period.remove_entries(name="coffee", limit=4)
+        self.assertIn("error", response)
+        response = self.period.remove_entries(name="coffee", dry_run=True)
+        self.assertListEqual(response["ids"], [2, 3, 4, 5, 1])
+        self.assertEqual(len(self.period.find_entry(name="coffee")), 7)
+
+        self.period.table("repetitive")
+        with mock.patch.object(self.period._storage, "write",
+                wraps=self.period._storage.write) as write:
+            response = self.period.remove_entries(name="coffee")
+        self.assertListEqual(response["ids"], [2, 3, 4, 5, 1])
+        # one write per table
+        self.assertEqual(write.call_count, 2)
+        self.assertListEqual(self.period.find_entry(name="coffee"), [])
+        self.assertEqual(self.period._category_cache["coffee"]["drinks"], 0)
+        self.assertEqual(len(self.period), 1)
+
+        self.assertIn("error", self.period.remove_entries())
+        self.assertIn("error", self.period.remove_entries(name="coffee"))
+
+    def test_summary(self):
+        self.period.add_entry(name="salary", value=1000, category="work",
+                date="1901-10-15")
+        self.period.add_entry(name="rent", value=-500,
+                repetitive=["monthly", "1901-10-01"], category="housing")
+        summary = self.period.summary()["summary"]
+        self.assertDictEqual(summary["earnings"], {"work": 1000})
+        self.assertDictEqual(summary["expenses"], {
+            CategoryItem.DEFAULT_NAME.lower(): -999.99, "housing": -1500})
+        self.assertDictEqual(summary["months"]["1901-11"],
+                {"earnings": 0, "expenses": -500})
+
+        # aggregates are updated without scanning the standard table
+        with mock.patch.object(self.period, "_aggregate",
+                wraps=self.period._aggregate) as aggregate:
+            self.period.add_entries([
+                dict(name="bonus", value=0.1, category="work",
+                    date="1901-10-16"),
+                dict(name="bonus", value=0.2, date="1901-10-17")])
+            self.period.remove_entry(name="bicycle")
+            summary = self.period.summary(month="1901-10")["summary"]
+        self.assertEqual(len(aggregate.call_args_list), 2)
+        self.assertEqual(summary["earnings"]["work"], 1000.3)
+        self.assertDictEqual(summary["expenses"], {"housing": -500})
+        self.assertListEqual(list(summary["months"]), ["1901-10"])
+
+    def test_summary_repetitive_cutoff(self):
+        self.period.add_entry(name="rent", value=-500,
+                repetitive=["monthly", "1901-10-01"], category="housing")
+        template = self.period.table("repetitive").all()[0]
+        end = self.period._repetitive_end(template)
+        summary = self.period.summary()["summary"]
+        self.assertEqual(summary["expenses"]["housing"], -1500)
+
+        with mock.patch.object(self.period, "_repetitive_end",
+                return_value=end.replace(month=11, day=1)):
+            summary = self.period.summary()["summary"]
+        self.assertEqual(summary["expenses"]["housing"], -1000)
+
+    def test_iter_table(self):
+        self.period.add_entry(name="Bicycle bell", value=-5, date="1901-01-02")
+        for table_name in ["standard", "repetitive"]:
+            self.period._index(table_name)
+        # narrowed queries look up the candidates only
+        with mock.patch.object(database.StorageProxy, "read") as read:
+            elements = self.period.find_entry(name="bell",
+                    create_recurrent_elements=False)
+        read.assert_not_called()
+        self.assertEqual(elements[0].eid, 2)
+
+        # other queries are served from the query cache when repeated
+        self.period.find_entry(name="b", create_recurrent_elements=False)
+        with mock.patch.object(database.StorageProxy, "read") as read:
+            elements = self.period.find_entry(name="b",
+                    create_recurrent_elements=False)
+        read.assert_not_called()
+        self.assertEqual(len(elements), 2)
+
+    def test_summary_repetitive_removed(self):
+        for name in ["rent", "insurance"]:
+            self.period.add_entry(name=name, value=-500,
+                    repetitive=["monthly", "1901-10-01"], category="housing")
+        self.period.summary()
+        self.assertEqual(len(self.period._repetitive_aggregates), 2)
+
+        self.period.remove_entry(name="rent")
+        self.period.remove_entries(name="insurance")
+        self.assertDictEqual(self.period._repetitive_aggregates, {})
+        self.assertNotIn("housing", self.period.summary()["summary"][
+            "expenses"])
+
     def test_remove_nonexisting_entry(self):
         response = self.period.remove_entry(name="non-existing")
         self.assertIn("error", list(response.keys()))
 
+    def test_indices(self):
+        self.period.add_entry(name="Bicycle bell", value=-5, date="1901-01-02")
+        self.period.add_entry(name="rent", value=-500,
+                repetitive=["monthly", "1901-10-01"], category="Housing")
+        self.assertSetEqual(
+                self.period._index("standard").candidates(name="bicycle"),
+                {1, 2})
+        self.assertEqual(len(self.period.find_entry(name="bicycle b")), 1)
+        self.assertEqual(len(self.period.print_entries(category="hous")[
+            "elements"]), 3)
+
+        self.period.remove_entry(name="bicycle bell")
+        self.assertSetEqual(
+                self.period._index("standard").candidates(name="bicycle"),
+                {1})
+        self.assertEqual(len(self.period.find_entry(name="bicycle")), 1)
+
+    def test_repetitive_cache(self):
+        self.period.add_entry(name="rent", value=-500,
+                repetitive=["monthly", "1901-10-01"])
+        with mock.patch.object(self.period, "_expand_repetitive_element",
+                wraps=self.period._expand_repetitive_element) as expand:
+            first = self.period.print_entries()["elements"]
+            second = self.period.print_entries()["elements"]
+        self.assertEqual(expand.call_count, 1)
+        self.assertListEqual(first, second)
+
+        # cached elements are not handed out
+        second[-1]["name"] = "modified"
+        self.assertEqual(
+                self.period.print_entries(date="1901-12")["elements"][0]["name"],
+                "rent december")
+
+    def test_repetitive_cache_invalidation(self):
+        self.period.add_entry(name="rent", value=-500,
+                repetitive=["monthly", "1901-10-01"])
+        element = self.period.table("repetitive").all()[0]
+        self.assertEqual(len(list(
+            self.period._create_repetitive_elements(element))), 3)
+        self.assertEqual(len(self.period._repetitive_cache), 1)
+
+        # expansion with moved cutoff
+        key = self.period._template_key(element)
+        end, elements, dates = self.period._repetitive_cache[key]
+        self.period._repetitive_cache[key] = (end.replace(day=1),
+                elements[:2], dates[:2])
+        self.assertEqual(len(list(
+            self.period._create_repetitive_elements(element))), 3)
+
+        self.period.remove_entry(name="rent")
+        self.assertEqual(len(self.period._repetitive_cache), 0)
+
+    def test_repetitive_predicate_pushdown(self):
+        self.period.add_entry(name="rent", value=-500, category="housing",
+                repetitive=["monthly", "1901-01-01"])
+        self.period.add_entry(name="coffee", value=-2, category="food",
+                repetitive=["daily", "1901-01-01"])
+        with mock.patch.object(self.period, "_expand_repetitive_element",
+                wraps=self.period._expand_repetitive_element) as expand:
+            elements = self.period.print_entries(category="hous")["elements"]
+            self.assertEqual(len(elements), 12)
+            elements = self.period.print_entries(name="rent")["elements"]
+            self.assertEqual(len(elements), 12)
+            elements = self.period.print_entries(name="rent march")["elements"]
+            self.assertEqual(len(elements), 1)
+        # the daily template is never expanded
+        self.assertEqual(expand.call_count, 1)
+
+    def test_repetitive_date_range(self):
+        self.period.add_entry(name="coffee", value=-2,
+                repetitive=["daily", "1901-02-01", "1901-11-30"])
+        self.period.add_entry(name="tea", value=-1,
+                repetitive=["weekly", "1901-12-01"])
+        with mock.patch.object(self.period, "_expand_repetitive_element",
+                wraps=self.period._expand_repetitive_element) as expand:
+            elements = self.period.print_entries(date="1901-03")["elements"]
+            self.assertEqual(len(elements), 31)
+            self.assertEqual(elements[0]["date"], "1901-03-01")
+            self.assertEqual(elements[-1]["date"], "1901-03-31")
+            self.assertEqual(expand.call_count, 1)
+
+            elements = self.period.print_entries(date="1901-12")["elements"]
+            self.assertEqual(len(elements), 5)
+            self.assertEqual(len(self.period.print_entries(
+                date="03-1")["elements"]), 10)
+        self.assertEqual(expand.call_count, 2)
+
+    def test_iter_entries(self):
+        self.period.add_entry(name="coffee", value=-2,
+                repetitive=["daily", "1901-01-01"])
+        with mock.patch.object(self.period, "_expand_repetitive_element",
+                wraps=self.period._expand_repetitive_element) as expand:
+            elements = self.period.iter_entries()
+            self.assertEqual(next(elements)["name"], "bicycle")
+            self.assertEqual(expand.call_count, 0)
+            self.assertEqual(next(elements)["name"], "coffee")
+            self.assertEqual(expand.call_count, 1)
+
+    def test_find_entry_limit(self):
+        self.period.add_entry(name="coffee", value=-2,
+                repetitive=["daily", "1901-01-01"])
+        self.assertEqual(len(self.period.find_entry(limit=3)), 3)
+        self.assertEqual(len(self.period.find_entry(name="coffee", limit=0)), 0)
+        self.assertEqual(
+                len(self.period.print_entries(limit=5)["elements"]), 5)
+
+    def tearDown(self):
+        self.period.close()
+
+class CategoryCacheReopenTestCase(unittest.TestCase):
+    def setUp(self):
+        if not os.path.isdir(CONFIG_DIR):
+            os.makedirs(CONFIG_DIR)
+        self.filepath = os.path.join(CONFIG_DIR, "1902.json")
+        self.period = None
+
+    def test_repetitive_counted_on_reopen(self):
+        self.period = TinyDbPeriod(name=1902)
+        self.period.add_entry(name="Rent", value=-500, category="Housing",
+                repetitive=["monthly", "1902-01-01"])
+        cache = dict(self.period._category_cache)
+        self.period.close()
+
+        self.period = TinyDbPeriod(name=1902)
+        self.assertDictEqual(dict(self.period._category_cache), cache)
+        self.period.add_entry(name="rent", value=-500, date="1902-01-01")
+        self.assertEqual(self.period.get(eid=1)["category"], "housing")
+
+    def test_sqlite_repetitive_counted_on_reopen(self):
+        path = self.filepath[:-len(".json")] + ".db"
+        self.period = SqlitePeriod(name=1902, path=path)
+        self.period.add_entry(name="Rent", value=-500, category="Housing",
+                repetitive=["monthly", "1902-01-01"])
+        cache = dict(self.period._category_cache)
+        self.period.close()
+
+        self.period = SqlitePeriod(name=1902, path=path)
+        self.assertDictEqual(dict(self.period._category_cache), cache)
+
+    def tearDown(self):
+        if self.period is not None:
+            self.period.close()
+        base = self.filepath[:-len(".json")]
+        for path in [self.filepath, base + ".db", base + ".db-wal",
+                base + ".db-shm"]:
+            if os.path.exists(path):
+                os.remove(path)
+
+class SqlitePeriodTestCase(unittest.TestCase):
+    def setUp(self):
+        self.period = SqlitePeriod(name=1901, path=":memory:")
+        self.period.add_entry(name="Bicycle", value=-999.99, date="1901-01-01")
+
+    def test_find_entry(self):
+        elements = self.period.find_entry(name="Bicycle")
+        self.assertEqual(len(elements), 1)
+        self.assertIsInstance(elements[0], database.Element)
+        self.assertEqual(elements[0].eid, 1)
+        self.assertEqual(elements[0]["value"], -999.99)
+
+    def test_remove_entry(self):
+        response = self.period.remove_entry(category=CategoryItem.DEFAULT_NAME)
+        self.assertEqual(1, response["id"])
+        self.assertListEqual(self.period.find_entry(), [])
+
+    def test_create_models_query_kwargs(self):
+        self.period.add_entry(name="Xmas gifts", value=500, date="1901-12-23")
+        elements = self.period.print_entries(date="1901-12")
+        self.assertEqual(len(elements["elements"]), 1)
+        self.assertEqual(elements["elements"][0]["name"], "xmas gifts")
+
+        self.period.add_entry(name="hammer", value=-33, date="1901-12-20")
+        elements = self.period.print_entries(name="xmas", date="1901-12")
+        self.assertEqual(len(elements["elements"]), 1)
+        self.assertEqual(elements["elements"][0]["name"], "xmas gifts")
+
+    def test_repetitive_entries(self):
+        self.period.add_entry(name="rent", value=-500,
+                repetitive=["monthly", "1901-10-01"], category="housing")
+
+        elements = self.period.print_entries(date="1901-11")
+        self.assertEqual(len(elements["elements"]), 1)
+        self.assertEqual(elements["elements"][0]["name"], "rent november")
+
+        elements = self.period.print_entries(category="housing")
+        self.assertEqual(len(elements["elements"]), 3)
+
+        response = self.period.remove_entry(name="rent")
+        self.assertEqual(1, response["id"])
+        self.assertEqual(len(self.period.find_entry()), 1)
+
+    def test_category_cache(self):
+        self.period.add_entry(name="walmart", value=-50.01,
+                category="groceries", date="1901-02-02")
+        self.period.add_entry(name="walmart", value=-0.99, date="1901-02-03")
+
+        groceries_elements = self.period.find_entry(category="groceries")
+        self.assertEqual(len(groceries_elements), 2)
+        self.assertAlmostEqual(
+                sum([e["value"] for e in groceries_elements]), -51)
+
+    def test_add_entries(self):
+        entries = [
+                dict(name="Walmart", value=-50.01, category="Groceries",
+                    date="1901-02-02"),
+                dict(name="rent", value=-500,
+                    repetitive=["monthly", "1901-10-01"]),
+                dict(name="walmart", value=-0.99, date="1901-02-03"),
+                ]
+        response = self.period.add_entries(entries)
+        self.assertListEqual(response["ids"], [2, 1, 3])
+        elements = self.period.find_entry(category="groceries")
+        self.assertListEqual([e.eid for e in elements], [2, 3])
+        self.assertEqual(len(self.period.find_entry(name="rent")), 3)
+
+    def test_remove_entries(self):
+        for day in range(2, 6):
+            self.period.add_entry(name="coffee", value=-2, category="Drinks",
+                    date="1901-01-0{}".format(day))
+        self.period.add_entry(name="coffee", value=-20,
+                repetitive=["monthly", "1901-10-01"])
+
+        self.assertIn("error",
+                self.period.remove_entries(category="drinks", limit=3))
+        response = self.period.remove_entries(name="coffee")
+        self.assertListEqual(response["ids"], [2, 3, 4, 5, 1])
+        self.assertListEqual(self.period.find_entry(name="coffee"), [])
+        self.assertEqual(self.period._category_cache["coffee"]["drinks"], 0)
+        self.assertEqual(len(self.period.find_entry()), 1)
+
+    def test_summary(self):
+        self.period.add_entry(name="salary", value=1000, category="work",
+                date="1901-10-15")
+        self.period.add_entry(name="rent", value=-500,
+                repetitive=["monthly", "1901-10-01"], category="housing")
+        self.period.summary()
+        self.period.remove_entries(name="bicycle")
+        summary = self.period.summary()["summary"]
+        self.assertDictEqual(summary["earnings"], {"work": 1000})
+        self.assertDictEqual(summary["expenses"], {"housing": -1500})
+        self.assertEqual(len(summary["months"]), 3)
+
+    def test_remove_nonexisting_entry(self):
+        response = self.period.remove_entry(name="non-existing")
+        self.assertIn("error", list(response.keys()))
+
+    def test_regex_query(self):
+        self.period.add_entry(name="Bike", value=-99, date="1901-01-02")
+        elements = self.period.find_entry(name="bi.*e")
+        self.assertEqual(len(elements), 2)
+
+    def test_write_behind(self):
+        self.period.close()
+        self.period = SqlitePeriod(name=1901, path=":memory:",
+                write_behind=True)
+        self.period.add_entry(name="Bike", value=-99, date="1901-01-02")
+        self.assertEqual(self.period.pending_writes, 1)
+        self.assertEqual(len(self.period.find_entry(name="bike")), 1)
+        self.period.flush()
+        self.assertEqual(self.period.pending_writes, 0)
+
+    def test_iter_entries(self):
+        self.period.FETCH_SIZE = 2
+        for day in range(2, 7):
+            self.period.add_entry(name="Bike", value=-99,
+                    date="1901-01-0{}".format(day))
+        elements = self.period.iter_entries(name="bike", limit=3)
+        self.assertListEqual([e.eid for e in elements], [2, 3, 4])
+        self.assertEqual(len(self.period.find_entry(name="bi")), 6)
+
     def tearDown(self):
         self.period.close()
 
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import unittest
+
+import random
+from datetime import date, datetime as dt
+from dateutil import rrule
+from financeager.recurrence import occurrences, FREQUENCIES
+
+
+def suite():
+    suite = unittest.TestSuite()
+    tests = [
+            'test_monthly_skips_invalid_days',
+            'test_yearly_leap_day',
+            'test_end_before_start',
+            'test_unsupported_frequency',
+            'test_identical_to_rrule'
+            ]
+    suite.addTest(unittest.TestSuite(map(OccurrencesTestCase, tests)))
+    return suite
+
+class OccurrencesTestCase(unittest.TestCase):
+    def test_monthly_skips_invalid_days(self):
+        self.assertListEqual(
+                occurrences("MONTHLY", date(2017, 1, 31), date(2017, 7, 1)),
+                [date(2017, 1, 31), date(2017, 3, 31), date(2017, 5, 31)])
+
+    def test_yearly_leap_day(self):
+        self.assertListEqual(
+                occurrences("YEARLY", date(2016, 2, 29), date(2024, 2, 28)),
+                [date(2016, 2, 29), date(2020, 2, 29)])
+
+    def test_end_before_start(self):
+        self.assertListEqual(
+                occurrences("DAILY", date(2017, 2, 1), date(2017, 1, 1)), [])
+
+    def test_unsupported_frequency(self):
+        self.assertRaises(ValueError, occurrences, "HOURLY",
+                date(2017, 1, 1), date(2017, 1, 2))
+
+    def test_identical_to_rrule(self):
+        rand = random.Random(42)
+        for _ in range(500):
+            frequency = rand.choice(FREQUENCIES)
+            interval = rand.choice([1, 2, 3, 6])
+            start = date.fromordinal(
+                    date(2015, 1, 1).toordinal() + rand.randrange(800))
+            end = date.fromordinal(start.toordinal() + rand.randrange(1500))
+            rule = rrule.rrule(getattr(rrule, frequency), interval=interval,
+                    dtstart=dt.combine(start, dt.min.time()),
+                    until=dt.combine(end, dt.min.time()))
+            self.assertListEqual(
+                    occurrences(frequency, start, end, interval),
+                    [d.date() for d in rule],
+                    msg="{} {} {} {}".format(frequency, interval, start, end))
+
+if __name__ == '__main__':
+    unittest.main()
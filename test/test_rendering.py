@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import unittest
+import random
+
+from financeager.rendering import Table, prettify, format_category_row
+from financeager.model import Model
+from financeager.entries import CategoryEntry
+
+
+def suite():
+    suite = unittest.TestSuite()
+    tests = [
+            'test_str_equals_model_str',
+            'test_total_value',
+            'test_invalid_date',
+            'test_random_elements'
+            ]
+    suite.addTest(unittest.TestSuite(map(TableTestCase, tests)))
+    tests = [
+            'test_empty',
+            'test_side_by_side',
+            'test_stacked_layout'
+            ]
+    suite.addTest(unittest.TestSuite(map(PrettifyTestCase, tests)))
+    return suite
+
+ELEMENTS = [
+        dict(name="Ice cream", value=-4.5, date="2017-08-01", category="Food"),
+        dict(name="  gas  STATION ", value=-30.125, date="2017-08-02"),
+        dict(name="groceries from the supermarket", value=-12.34,
+            date="2017-08-03", category="food"),
+        dict(name="salary", value=2000, date="2017-08-01", category="Work"),
+        ]
+
+class TableTestCase(unittest.TestCase):
+    def test_str_equals_model_str(self):
+        self.assertEqual(str(Table.from_elements(ELEMENTS, "Elements")),
+                str(Model.from_tinydb(ELEMENTS, "Elements")))
+        self.assertEqual(str(Table.from_elements([])),
+                str(Model.from_tinydb([])))
+
+    def test_total_value(self):
+        table = Table.from_elements(ELEMENTS)
+        self.assertEqual(table.total_value(),
+                Model.from_tinydb(ELEMENTS).total_value())
+        self.assertEqual(format_category_row("Total", table.total_value()),
+                str(CategoryEntry("TOTAL", table.total_value())))
+
+    def test_invalid_date(self):
+        elements = [dict(name="a", value=1, date=d)
+                for d in ["2017-1-1", "2017-02-30", None, "0017-01-01"]]
+        self.assertEqual(str(Table.from_elements(elements)),
+                str(Model.from_tinydb(elements)))
+
+    def test_random_elements(self):
+        random.seed(0)
+        elements = [dict(
+            name=random.choice(["x", "ice cream", "Öl wechsel", "sixteen chars plus"]),
+            value=random.uniform(-1e4, 1e4),
+            date="2017-{:02d}-{:02d}".format(random.randint(1, 12),
+                random.randint(1, 28)),
+            category=random.choice([None, "Food", "FOOD", "big spender"]))
+            for _ in range(200)]
+        self.assertEqual(str(Table.from_elements(elements)),
+                str(Model.from_tinydb(elements)))
+
+class PrettifyTestCase(unittest.TestCase):
+    def test_empty(self):
+        self.assertEqual(prettify([]), "")
+
+    def test_side_by_side(self):
+        self.assertEqual(prettify(ELEMENTS), "\n".join([
+            "               Earnings                |                Expenses               ",
+            "Name               Value    Date       | Name               Value    Date      ",
+            "Work                2000.00            | Food                  16.84           ",
+            "  Salary            2000.00 2017-08-01 |   Ice Cream            4.50 2017-08-01",
+            "                                       |   Groceries From T    12.34 2017-08-03",
+            "                                       | Unspecified           30.12           ",
+            "                                       |   Gas Station         30.12 2017-08-02",
+            79*"=",
+            "Total               2000.00            | Total                 46.96           "]))
+
+    def test_stacked_layout(self):
+        result = prettify(ELEMENTS[-1:], stacked_layout=True)
+        self.assertEqual(result, "\n".join([
+            str(Model.from_tinydb(ELEMENTS[-1:], "Earnings")),
+            "",
+            38*"-",
+            "",
+            str(Model.from_tinydb([], "Expenses"))]))
+
+if __name__ == '__main__':
+    unittest.main()
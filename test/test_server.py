@@ -3,9 +3,12 @@ from __future__ import unicode_literals
 import unittest
 
 from financeager.items import CategoryItem
-from financeager.server import Server
-from financeager.period import CONFIG_DIR
+from financeager.server import Server, _ReadWriteLock
+from financeager.period import Period, CONFIG_DIR
 import os.path
+import threading
+import time
+from unittest import mock
 from tinydb import database, storages
 
 
@@ -20,9 +23,46 @@ def suite():
     suite.addTest(unittest.TestSuite(map(AddEntryToServerTestCase, tests)))
     tests = [
             'test_query_and_reset_response',
-            'test_response_is_none'
+            'test_response_is_none',
+            'test_add_many',
+            'test_rm_many',
+            'test_summary',
+            'test_default_period'
             ]
     suite.addTest(unittest.TestSuite(map(FindEntryServerTestCase, tests)))
+    tests = [
+            'test_write_acknowledged_from_memory',
+            'test_flush_on_size_threshold',
+            'test_flush_on_stop'
+            ]
+    suite.addTest(unittest.TestSuite(map(WriteBehindServerTestCase, tests)))
+    tests = [
+            'test_period_file_exists',
+            'test_add_print_rm',
+            'test_max_bytes'
+            ]
+    suite.addTest(unittest.TestSuite(map(SqliteServerTestCase, tests)))
+    tests = [
+            'test_max_periods',
+            'test_reopen',
+            'test_max_bytes',
+            'test_flush_on_eviction',
+            'test_non_persistent_period_kept'
+            ]
+    suite.addTest(unittest.TestSuite(map(EvictionServerTestCase, tests)))
+    tests = [
+            'test_shared',
+            'test_writer_excludes_readers',
+            'test_waiting_writer_precedes_readers'
+            ]
+    suite.addTest(unittest.TestSuite(map(ReadWriteLockTestCase, tests)))
+    tests = [
+            'test_concurrent_reads',
+            'test_reads_serialized_for_json_storage',
+            'test_writes_exclusive',
+            'test_periods_independent'
+            ]
+    suite.addTest(unittest.TestSuite(map(ConcurrentServerTestCase, tests)))
     return suite
 
 
@@ -69,5 +109,268 @@ class FindEntryServerTestCase(unittest.TestCase):
                 category=CategoryItem.DEFAULT_NAME)
         self.assertListEqual([], response["elements"])
 
+    def test_add_many(self):
+        response = self.server.run("add-many", period=self.period, entries=[
+            dict(name="Socks", value=-9.99, category="Outdoors"),
+            dict(name="hiking boots", value=-99.99)])
+        self.assertListEqual(response["ids"], [2, 3])
+        response = self.server.run("print", period=self.period,
+                category=CategoryItem.DEFAULT_NAME)
+        self.assertEqual(len(response["elements"]), 2)
+
+    def test_rm_many(self):
+        self.server.run("add", name="Hiking socks", value=-9.99,
+                period=self.period)
+        response = self.server.run("rm-many", period=self.period,
+                name="hiking", dry_run=True)
+        self.assertListEqual(response["ids"], [1, 2])
+        response = self.server.run("rm-many", period=self.period,
+                name="hiking")
+        self.assertListEqual(response["ids"], [1, 2])
+        response = self.server.run("print", period=self.period)
+        self.assertListEqual(response["elements"], [])
+
+    def test_summary(self):
+        response = self.server.run("summary", period=self.period)
+        self.assertAlmostEqual(response["summary"]["expenses"][
+            CategoryItem.DEFAULT_NAME.lower()], -111.11)
+
+    def test_default_period(self):
+        self.server.run("add", name="Socks", value=-9.99)
+        response = self.server.run("print", period=str(Period.DEFAULT_NAME))
+        self.assertEqual(len(response["elements"]), 1)
+        self.assertListEqual(self.server.run("list")["periods"],
+                [self.period, str(Period.DEFAULT_NAME)])
+
+class WriteBehindServerTestCase(unittest.TestCase):
+    def setUp(self):
+        # large interval to avoid flushing by time
+        self.server = Server(write_behind=True, flush_interval=60,
+                flush_size=5)
+        self.period = "0"
+        self.filepath = os.path.join(CONFIG_DIR, "0.json")
+        self.server.run("add", name="Hiking boots", value=-111.11,
+                period=self.period)
+
+    def read_file(self):
+        with open(self.filepath) as file:
+            return file.read()
+
+    def test_write_acknowledged_from_memory(self):
+        self.assertGreater(self.server._periods["0"].pending_writes, 0)
+        self.assertNotIn("hiking boots", self.read_file())
+        response = self.server.run("print", period=self.period)
+        self.assertEqual(len(response["elements"]), 1)
+
+    def test_flush_on_size_threshold(self):
+        self.server.run("add", name="Backpack", value=-66.66,
+                period=self.period)
+        for _ in range(5):
+            self.server.run("add", name="Socks", value=-9.99,
+                    period=self.period)
+        for _ in range(100):
+            if not self.server._periods["0"].pending_writes:
+                break
+            time.sleep(0.01)
+        self.assertIn("backpack", self.read_file())
+
+    def test_flush_on_stop(self):
+        self.server.run("stop")
+        self.assertIn("hiking boots", self.read_file())
+
+    def tearDown(self):
+        self.server.run("stop")
+        os.remove(self.filepath)
+
+class SqliteServerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.server = Server(backend="sqlite")
+        self.period = "0"
+        self.filepath = os.path.join(CONFIG_DIR, "0.db")
+        self.server.run("add", name="Hiking boots", value=-111.11,
+                category="outdoors", period=self.period)
+
+    def test_period_file_exists(self):
+        self.assertTrue(os.path.isfile(self.filepath))
+
+    def test_add_print_rm(self):
+        response = self.server.run("print", period=self.period,
+                category="outdoors")
+        self.assertEqual(response["elements"][0]["name"], "hiking boots")
+        response = self.server.run("rm", period=self.period, name="hiking")
+        self.assertEqual(response["id"], 1)
+        response = self.server.run("print", period=self.period)
+        self.assertListEqual(response["elements"], [])
+
+    def test_max_bytes(self):
+        self.assertGreater(self.server._periods["0"].resident_bytes, 0)
+        self.server.run("stop")
+        self.server = Server(backend="sqlite", max_bytes=1)
+        for name in ["1", "0"]:
+            self.server.run("print", period=name)
+        self.assertListEqual(list(self.server._periods), ["0"])
+
+    def tearDown(self):
+        self.server.run("stop")
+        for name in ["0", "1"]:
+            filepath = os.path.join(CONFIG_DIR, "{}.db".format(name))
+            for suffix in ["", "-wal", "-shm"]:
+                if os.path.exists(filepath + suffix):
+                    os.remove(filepath + suffix)
+
+class EvictionServerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.period_names = ["0", "1", "2"]
+        self.server = None
+
+    def create_server(self, **kwargs):
+        self.server = Server(**kwargs)
+        for name in self.period_names:
+            self.server.run("add", name="Hiking boots", value=-111.11,
+                    period=name)
+
+    def test_max_periods(self):
+        self.create_server(max_periods=2)
+        self.assertListEqual(list(self.server._periods), ["1", "2"])
+
+    def test_reopen(self):
+        self.create_server(max_periods=2)
+        response = self.server.run("print", period="0")
+        self.assertEqual(len(response["elements"]), 1)
+        self.assertListEqual(list(self.server._periods), ["2", "0"])
+
+    def test_max_bytes(self):
+        self.create_server(max_bytes=1)
+        self.assertListEqual(list(self.server._periods), ["2"])
+
+    def test_flush_on_eviction(self):
+        # large interval to avoid flushing by time
+        self.create_server(max_periods=1, write_behind=True,
+                flush_interval=60)
+        with open(os.path.join(CONFIG_DIR, "0.json")) as file:
+            self.assertIn("hiking boots", file.read())
+
+    def test_non_persistent_period_kept(self):
+        self.create_server(max_periods=1, storage=storages.MemoryStorage)
+        self.assertEqual(len(self.server._periods), 3)
+        self.period_names = []
+
+    def tearDown(self):
+        self.server.run("stop")
+        for name in self.period_names:
+            filepath = os.path.join(CONFIG_DIR, "{}.json".format(name))
+            os.remove(filepath)
+
+class ReadWriteLockTestCase(unittest.TestCase):
+    def setUp(self):
+        self.lock = _ReadWriteLock()
+
+    def test_shared(self):
+        self.assertTrue(self.lock.acquire(shared=True))
+        self.assertTrue(self.lock.acquire(shared=True, blocking=False))
+        self.assertFalse(self.lock.acquire(shared=False, blocking=False))
+        self.lock.release(shared=True)
+        self.lock.release(shared=True)
+        self.assertTrue(self.lock.acquire(shared=False, blocking=False))
+
+    def test_writer_excludes_readers(self):
+        with self.lock.writing():
+            self.assertFalse(self.lock.acquire(shared=True, blocking=False))
+        with self.lock.reading():
+            pass
+
+    def test_waiting_writer_precedes_readers(self):
+        self.lock.acquire(shared=True)
+        writer = threading.Thread(target=self.lock.acquire, args=(False,))
+        writer.start()
+        while not self.lock._waiting_writers:
+            time.sleep(0.001)
+        self.assertFalse(self.lock.acquire(shared=True, blocking=False))
+        self.lock.release(shared=True)
+        writer.join(5)
+        self.assertTrue(self.lock._writer)
+
+class ConcurrentServerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.server = Server(storage=storages.MemoryStorage)
+        self.server.run("add", name="Hiking boots", value=-111.11,
+                period="0")
+
+    def run_concurrently(self, *requests):
+        """Run the requests (tuples of command and kwargs) in threads and
+        return the responses."""
+        responses = [None] * len(requests)
+        def run(i, command, kwargs):
+            responses[i] = self.server.run(command, **kwargs)
+        threads = [threading.Thread(target=run, args=(i,) + r)
+                for i, r in enumerate(requests)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        return responses
+
+    def test_concurrent_reads(self):
+        period = self.server._periods["0"]
+        # both reads have to be in progress at the same time
+        barrier = threading.Barrier(2, timeout=5)
+        print_entries = period.print_entries
+        def print_entries_waiting(**kwargs):
+            barrier.wait()
+            return print_entries(**kwargs)
+        with mock.patch.object(period, "print_entries",
+                side_effect=print_entries_waiting):
+            responses = self.run_concurrently(("print", dict(period="0")),
+                    ("print", dict(period="0")))
+        self.assertEqual([len(r["elements"]) for r in responses], [1, 1])
+
+    def test_reads_serialized_for_json_storage(self):
+        server = Server()
+        server.run("print", period="0")
+        self.assertFalse(server._periods["0"].concurrent_reads)
+        server.run("stop")
+        os.remove(os.path.join(CONFIG_DIR, "0.json"))
+
+    def test_writes_exclusive(self):
+        period = self.server._periods["0"]
+        active = []
+        overlaps = []
+        add_entry = period.add_entry
+        def add_entry_tracked(**kwargs):
+            active.append(1)
+            overlaps.append(len(active))
+            time.sleep(0.01)
+            active.pop()
+            return add_entry(**kwargs)
+        with mock.patch.object(period, "add_entry",
+                side_effect=add_entry_tracked):
+            self.run_concurrently(*(4 * [("add", dict(period="0",
+                name="Socks", value=-9.99))]))
+        self.assertListEqual(overlaps, [1, 1, 1, 1])
+        self.assertEqual(len(self.server.run("print", period="0")[
+            "elements"]), 5)
+
+    def test_periods_independent(self):
+        self.server.run("print", period="1")
+        period = self.server._periods["0"]
+        released = threading.Event()
+        add_entry = period.add_entry
+        def add_entry_blocking(**kwargs):
+            released.wait(5)
+            return add_entry(**kwargs)
+        with mock.patch.object(period, "add_entry",
+                side_effect=add_entry_blocking):
+            blocked = threading.Thread(target=self.server.run, args=("add",),
+                    kwargs=dict(period="0", name="Socks", value=-9.99))
+            blocked.start()
+            # writing to another period is not blocked
+            self.server.run("add", period="1", name="Socks", value=-9.99)
+            self.assertTrue(blocked.is_alive())
+            released.set()
+            blocked.join(5)
+
+    def tearDown(self):
+        self.server.run("stop")
+
 if __name__ == '__main__':
     unittest.main()
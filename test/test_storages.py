@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import unittest
+
+import json
+import os.path
+import shutil
+import tempfile
+
+from tinydb import TinyDB, JSONStorage
+from financeager.storages import WalStorage, BufferedMiddleware
+
+
+def suite():
+    suite = unittest.TestSuite()
+    tests = [
+            'test_snapshot_not_rewritten',
+            'test_checkpoint_on_close',
+            'test_replay_after_crash',
+            'test_truncated_record_discarded',
+            'test_periodic_checkpoint'
+            ]
+    suite.addTest(unittest.TestSuite(map(WalStorageTestCase, tests)))
+    tests = [
+            'test_write_behind',
+            'test_write_through',
+            'test_durable',
+            'test_flush_on_close'
+            ]
+    suite.addTest(unittest.TestSuite(map(BufferedMiddlewareTestCase, tests)))
+    return suite
+
+class WalStorageTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filepath = os.path.join(self.directory, "1901.json")
+        self.db = TinyDB(self.filepath, storage=WalStorage,
+                default_table="standard")
+        self.db.insert(dict(name="bicycle", value=-999.99))
+        self.db.insert(dict(name="paycheck", value=1000))
+
+    def test_snapshot_not_rewritten(self):
+        self.assertEqual(os.path.getsize(self.filepath), 0)
+        with open(self.filepath + WalStorage.LOG_SUFFIX) as log:
+            records = [json.loads(line) for line in log]
+        self.assertEqual(records[-1],
+                ["set", "standard", "2", {"name": "paycheck", "value": 1000}])
+
+    def test_checkpoint_on_close(self):
+        self.db.close()
+        self.assertEqual(
+                os.path.getsize(self.filepath + WalStorage.LOG_SUFFIX), 0)
+        with open(self.filepath) as snapshot:
+            data = json.load(snapshot)
+        self.assertEqual(len(data["standard"]), 2)
+
+        self.db = TinyDB(self.filepath, storage=WalStorage,
+                default_table="standard")
+        self.assertEqual(len(self.db), 2)
+
+    def test_replay_after_crash(self):
+        self.db.remove(eids=[1])
+        # simulate crash: database is not closed
+        db = TinyDB(self.filepath, storage=WalStorage,
+                default_table="standard")
+        self.assertEqual([e["name"] for e in db.all()], ["paycheck"])
+        self.assertEqual(db.insert(dict(name="rent", value=-500)), 3)
+        db.close()
+
+    def test_truncated_record_discarded(self):
+        log_path = self.filepath + WalStorage.LOG_SUFFIX
+        with open(log_path, "a") as log:
+            log.write('["set", "standard", "3", {"na')
+        db = TinyDB(self.filepath, storage=WalStorage,
+                default_table="standard")
+        self.assertEqual(len(db), 2)
+        db.insert(dict(name="rent", value=-500))
+        db.close()
+        db = TinyDB(self.filepath, storage=WalStorage,
+                default_table="standard")
+        self.assertEqual(len(db), 3)
+        db.close()
+
+    def test_periodic_checkpoint(self):
+        storage = self.db._storage
+        storage.CHECKPOINT_INTERVAL = 3
+        self.db.insert(dict(name="rent", value=-500))
+        self.assertEqual(storage._log_size, 0)
+        self.assertGreater(os.path.getsize(self.filepath), 0)
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.directory)
+
+class BufferedMiddlewareTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filepath = os.path.join(self.directory, "1901.json")
+
+    def create_db(self, **kwargs):
+        return TinyDB(self.filepath, default_table="standard",
+                storage=BufferedMiddleware(JSONStorage, **kwargs))
+
+    def read_file(self):
+        with open(self.filepath) as file:
+            content = file.read()
+        return json.loads(content) if content else {}
+
+    def test_write_behind(self):
+        db = self.create_db()
+        db.insert(dict(name="bicycle", value=-999.99))
+        self.assertGreater(db._storage.pending_writes, 0)
+        self.assertEqual(len(db), 1)
+        self.assertNotIn("1", self.read_file().get("standard", {}))
+
+        db._storage.flush()
+        self.assertEqual(db._storage.pending_writes, 0)
+        self.assertIn("1", self.read_file()["standard"])
+        db.close()
+
+    def test_write_through(self):
+        db = self.create_db(write_behind=False)
+        db.insert(dict(name="bicycle", value=-999.99))
+        self.assertEqual(db._storage.pending_writes, 0)
+        self.assertIn("1", self.read_file()["standard"])
+        db.close()
+
+    def test_durable(self):
+        db = self.create_db(durable=True)
+        db.insert(dict(name="bicycle", value=-999.99))
+        self.assertEqual(db._storage.pending_writes, 0)
+        self.assertIn("1", self.read_file()["standard"])
+        db.close()
+
+    def test_flush_on_close(self):
+        db = self.create_db()
+        db.insert(dict(name="bicycle", value=-999.99))
+        db.close()
+        self.assertIn("1", self.read_file()["standard"])
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import unittest
+import asyncio
+import os
+import psutil
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from tinydb import storages
+from financeager.server import Server
+from financeager.start_unixsocket_server import serve, acquire_lock
+from financeager.unixsocket import _Proxy, CommunicationError, is_running
+
+
+def suite():
+    suite = unittest.TestSuite()
+    tests = [
+            'test_add_print',
+            'test_add_many',
+            'test_error',
+            'test_concurrent_clients',
+            'test_stop',
+            'test_requests_after_stop_rejected',
+            'test_acquire_lock'
+            ]
+    suite.addTest(unittest.TestSuite(map(UnixSocketTestCase, tests)))
+    tests = [
+            'test_not_running'
+            ]
+    suite.addTest(unittest.TestSuite(map(NoServerTestCase, tests)))
+    tests = [
+            'test_concurrent_launch'
+            ]
+    suite.addTest(unittest.TestSuite(map(LaunchServerTestCase, tests)))
+    return suite
+
+class UnixSocketTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "financeager.sock")
+        self.server = Server(storage=storages.MemoryStorage)
+        self.thread = threading.Thread(target=asyncio.run, args=(serve(
+            self.server, self.path),))
+        self.thread.start()
+        for _ in range(500):
+            if is_running(self.path):
+                break
+            time.sleep(0.01)
+        self.proxy = _Proxy(self.path)
+
+    def test_add_print(self):
+        response = self.proxy.run("add", name="Hiking boots", value=-111.11,
+                category="outdoors", period="0")
+        self.assertEqual(response["id"], 1)
+        response = self.proxy.run("print", period="0")
+        self.assertEqual(response["elements"][0]["name"], "hiking boots")
+
+    def test_add_many(self):
+        entries = [dict(name="coffee", value=-2, date="2017-01-01")
+                for _ in range(5000)]
+        response = self.proxy.run("add-many", entries=entries, period="0")
+        self.assertEqual(len(response["ids"]), 5000)
+
+    def test_error(self):
+        response = self.proxy.run("rm", name="socks", period="0")
+        self.assertEqual(response["error"], "No entry matching the query.")
+
+    def test_concurrent_clients(self):
+        other_proxy = _Proxy(self.path)
+        self.proxy.run("add", name="Socks", value=-9.99, period="0")
+        response = other_proxy.run("print", period="0")
+        self.assertEqual(len(response["elements"]), 1)
+        other_proxy.close()
+
+    def test_stop(self):
+        self.proxy.run("stop")
+        self.thread.join(5)
+        self.assertFalse(self.thread.is_alive())
+        self.assertFalse(os.path.exists(self.path))
+        self.assertRaises(CommunicationError, _Proxy(self.path).run, "list")
+
+    def test_requests_after_stop_rejected(self):
+        other_proxy = _Proxy(self.path)
+        other_proxy.run("list")
+        stop_started = threading.Event()
+        release = threading.Event()
+        run = self.server.run
+
+        def blocking_run(command, **kwargs):
+            if command == "stop":
+                stop_started.set()
+                release.wait(5)
+            return run(command, **kwargs)
+
+        with mock.patch.object(self.server, "run",
+                side_effect=blocking_run) as mock_run:
+            stopper = threading.Thread(target=self.proxy.run, args=("stop",))
+            stopper.start()
+            stop_started.wait(5)
+            response = other_proxy.run("print", period="0")
+            release.set()
+            stopper.join(5)
+        self.assertEqual(response["error"], "Server is stopping.")
+        self.assertListEqual([c[0][0] for c in mock_run.call_args_list],
+                ["stop"])
+
+        # remaining connections are closed
+        self.thread.join(5)
+        self.assertFalse(self.thread.is_alive())
+        self.assertRaises(CommunicationError, other_proxy.run, "list")
+        other_proxy.close()
+
+    def test_acquire_lock(self):
+        lock_path = os.path.join(self.tmp_dir, "server.lock")
+        lock_file = acquire_lock(lock_path, self.path)
+        self.assertIsNotNone(lock_file)
+        # the socket is served, hence another server would exit
+        self.assertIsNone(acquire_lock(lock_path, self.path))
+        lock_file.close()
+
+    def tearDown(self):
+        if self.thread.is_alive():
+            self.proxy.run("stop")
+            self.thread.join(5)
+        self.proxy.close()
+        shutil.rmtree(self.tmp_dir)
+
+class NoServerTestCase(unittest.TestCase):
+    def test_not_running(self):
+        path = os.path.join(tempfile.gettempdir(), "financeager-none.sock")
+        self.assertFalse(is_running(path))
+        self.assertRaises(CommunicationError, _Proxy(path).run, "list")
+
+class LaunchServerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.home = tempfile.mkdtemp()
+        self.env = dict(os.environ, HOME=self.home)
+
+    def run_cli(self, *args):
+        return subprocess.Popen([sys.executable, "-m", "financeager.main",
+            "--communication-module", "unixsocket"] + list(args),
+            env=self.env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+            universal_newlines=True)
+
+    def find_servers(self):
+        return [p for p in psutil.process_iter(["cmdline", "environ"])
+                if any(a.endswith("start_unixsocket_server.py")
+                    for a in p.info["cmdline"] or [])
+                and (p.info["environ"] or {}).get("HOME") == self.home]
+
+    def test_concurrent_launch(self):
+        clients = [self.run_cli("print", "-p", "0") for _ in range(3)]
+        # the output pipes are closed once the clients exit
+        for client in clients:
+            client.communicate(timeout=20)
+            self.assertEqual(client.returncode, 0)
+        servers = self.find_servers()
+        self.assertEqual(len(servers), 1)
+
+        self.run_cli("stop").communicate(timeout=20)
+        servers[0].wait(5)
+
+    def tearDown(self):
+        for server in self.find_servers():
+            server.kill()
+        shutil.rmtree(self.home)
+
+if __name__ == '__main__':
+    unittest.main()
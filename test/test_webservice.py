@@ -11,7 +11,8 @@ from financeager.period import CONFIG_DIR
 def suite():
     suite = unittest.TestSuite()
     tests = [
-        'test_add_print_rm'
+        'test_add_print_rm',
+        'test_add_many'
         ]
     suite.addTest(unittest.TestSuite(map(WebserviceTestCase, tests)))
     return suite
@@ -38,6 +39,16 @@ class WebserviceTestCase(unittest.TestCase):
         response = self.proxy.run("list")
         self.assertEqual(response["periods"][0], self.period)
 
+    def test_add_many(self):
+        response = self.proxy.run("add-many", period=self.period, entries=[
+            dict(name="cookies", value=-100, category="food"),
+            dict(name="cookies", value=-50)])
+        self.assertListEqual(response["ids"], [1, 2])
+
+        response = self.proxy.run("print", period=self.period)
+        self.assertEqual(len(response["elements"]), 2)
+        self.assertEqual(response["elements"][1]["category"], "food")
+
     def tearDown(self):
         self.proxy.run("stop")
         if self.webservice_process is not None:
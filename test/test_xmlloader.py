@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import unittest
+import io
+from unittest import mock
+import xml.etree.ElementTree as ET
+
+from tinydb import storages
+from financeager.xmlloader import PeriodXmlReader, load_into_period, \
+        load_tables, iter_gui_months
+from financeager.period import XmlPeriod, TinyDbPeriod
+from financeager.rendering import prettify, prettify_tables
+
+
+def suite():
+    suite = unittest.TestSuite()
+    tests = [
+            'test_entries',
+            'test_period_name',
+            'test_model_element',
+            'test_load_into_period',
+            'test_load_into_period_in_chunks',
+            'test_load_tables',
+            'test_xml_period_from_file'
+            ]
+    suite.addTest(unittest.TestSuite(map(PeriodXmlReaderTestCase, tests)))
+    tests = [
+            'test_months',
+            'test_invalid_day',
+            'test_malformed'
+            ]
+    suite.addTest(unittest.TestSuite(map(GuiMonthsTestCase, tests)))
+    return suite
+
+class PeriodXmlReaderTestCase(unittest.TestCase):
+    def setUp(self):
+        period = XmlPeriod(name="1st Quartal")
+        period.add_entry(name="Paycheck", value=456.78, date="2017-01-31")
+        period.add_entry(name="Citroen", value="-24999", category="Car",
+                date="2017-02-01")
+        period.add_entry(name="Gas", value="-30.12", category="Car",
+                date="2017-02-02")
+        self.xml = ET.tostring(period.convert_to_xml(), "utf-8")
+
+    def test_entries(self):
+        entries = list(PeriodXmlReader(io.BytesIO(self.xml)))
+        self.assertListEqual(entries, [
+            dict(name="paycheck", value=456.78, date="2017-01-31",
+                category="unspecified"),
+            dict(name="citroen", value=-24999, date="2017-02-01",
+                category="car"),
+            dict(name="gas", value=-30.12, date="2017-02-02",
+                category="car")])
+
+    def test_period_name(self):
+        reader = PeriodXmlReader(io.BytesIO(self.xml))
+        self.assertIsNone(reader.name)
+        next(iter(reader))
+        self.assertEqual(reader.name, "1st Quartal")
+
+    def test_model_element(self):
+        xml = b'<model name="expenses"><entry name="gas" value="1" ' \
+                b'date="2017-02-02" category="car" /></model>'
+        entries = list(PeriodXmlReader(io.BytesIO(xml)))
+        self.assertEqual(entries[0]["value"], -1)
+
+    def test_load_into_period(self):
+        period = TinyDbPeriod(name=1901, storage=storages.MemoryStorage)
+        self.assertEqual(load_into_period(period, io.BytesIO(self.xml)), 3)
+        self.assertEqual(len(period.find_entry(category="car")), 2)
+        self.assertAlmostEqual(period.summary()["summary"]["expenses"]["car"],
+                -25029.12)
+
+    def test_load_into_period_in_chunks(self):
+        period = mock.Mock()
+        load_into_period(period, io.BytesIO(self.xml), chunk_size=2)
+        self.assertListEqual([len(c[0][0]) for c in
+            period.add_entries.call_args_list], [2, 1])
+
+    def test_load_tables(self):
+        elements = list(PeriodXmlReader(io.BytesIO(self.xml)))
+        self.assertEqual(prettify_tables(*load_tables(io.BytesIO(self.xml))),
+                prettify(elements))
+
+    def test_xml_period_from_file(self):
+        period = XmlPeriod.from_xml_file(io.BytesIO(self.xml))
+        self.assertEqual(period.name, "1st Quartal")
+        self.assertAlmostEqual(period._earnings_model.category_sum(
+            "unspecified"), 456.78)
+        self.assertAlmostEqual(period._expenses_model.category_sum("car"),
+                25029.12)
+
+class GuiMonthsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.xml = b"""<root name="year" value="2014">
+            <tab name="month" value="January">
+                <model name="expenditures" value="0"/>
+                <model name="receipts" value="0"/>
+            </tab>
+            <tab name="month" value="February">
+                <model name="expenditures" value="5">
+                    <category name="Groceries" value="5">
+                        <entry name="Lidl" value="5" date="%s"/>
+                    </category>
+                </model>
+                <model name="receipts" value="0"/>
+            </tab>
+        </root>"""
+
+    def test_months(self):
+        months = list(iter_gui_months(io.BytesIO(self.xml % b"14.")))
+        self.assertListEqual(months, [(2014, 1, []), (2014, 2, [dict(
+            name="Lidl", value=-5, date="2014-02-14", category="Groceries")])])
+
+    def test_invalid_day(self):
+        with self.assertRaisesRegex(ValueError, "Invalid day '30.'"):
+            list(iter_gui_months(io.BytesIO(self.xml % b"30.")))
+
+    def test_malformed(self):
+        self.assertRaises(ValueError, list,
+                iter_gui_months(io.BytesIO(self.xml[:-10])))
+
+if __name__ == '__main__':
+    unittest.main()